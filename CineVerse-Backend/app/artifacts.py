@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import time
+from typing import Optional
+from scipy.sparse import csr_matrix
+import numpy as np
+from app.config import ARTIFACTS_DIR
+from app.embeddings import EmbeddingIndex
+from app.model import RecommenderModel
+from app.neighbors import LSHIndex, NeighborTable
+from app.services.metrics import span
+
+# Bump whenever the on-disk layout changes; older builds are then ignored
+ARTIFACT_FORMAT = 4
+CURRENT_POINTER = "CURRENT"
+KEEP_BUILDS = 3
+
+
+def _write_json(path: str, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+@span("save_artifacts")
+def save_model(model: RecommenderModel, root: str = ARTIFACTS_DIR, sources: Optional[dict] = None,
+               report: Optional[dict] = None) -> str:
+    """
+    Writes `model` as a new versioned build under `root` and points CURRENT at it.
+
+    Layout of a build directory:
+        manifest.json       format version, shapes and source file stamps
+        indptr.npy, indices.npy, data.npy
+                            the CSR rating matrix
+        titles.json         row index -> title
+        user_ids.npy        column index -> MovieLens user id
+        records.json        MovieBase-ready metadata per row (null if missing)
+        movie_ids.npy, movie_rows.npy
+                            MovieLens movie id -> row
+        neighbors.npy, neighbor_scores.npy
+                            top-k cosine table ("table" engine)
+        lsh_keys.npy        LSH bucket keys per title ("ann" engine)
+        item_vectors.npy, item_norms.npy, user_factors.npy, singular_values.npy
+                            unit title embeddings, their norms, user
+                            embeddings and the spectrum ("svd" engine)
+
+    Returns:
+        str: The build id.
+    """
+    os.makedirs(root, exist_ok=True)
+    base_id = build_id = time.strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    while os.path.exists(os.path.join(root, build_id)):
+        suffix += 1
+        build_id = f"{base_id}-{suffix}"
+    tmp_dir = os.path.join(root, f".{build_id}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    matrix = model.matrix
+    np.save(os.path.join(tmp_dir, "indptr.npy"), matrix.indptr)
+    np.save(os.path.join(tmp_dir, "indices.npy"), matrix.indices)
+    np.save(os.path.join(tmp_dir, "data.npy"), matrix.data)
+    np.save(os.path.join(tmp_dir, "user_ids.npy"), np.asarray(model.user_ids))
+    np.save(os.path.join(tmp_dir, "movie_ids.npy"), np.asarray(model.movie_ids))
+    np.save(os.path.join(tmp_dir, "movie_rows.npy"), np.asarray(model.movie_rows))
+    _write_json(os.path.join(tmp_dir, "titles.json"), [str(t) for t in model.titles])
+    _write_json(os.path.join(tmp_dir, "records.json"), model.records)
+    engine = {}
+    if isinstance(model.neighbor_index, NeighborTable):
+        np.save(os.path.join(tmp_dir, "neighbors.npy"), model.neighbor_index.indices)
+        np.save(os.path.join(tmp_dir, "neighbor_scores.npy"), model.neighbor_index.scores)
+        engine = {"mode": "table", "metric": "cosine", "k": model.neighbor_index.k}
+    elif isinstance(model.neighbor_index, LSHIndex):
+        np.save(os.path.join(tmp_dir, "lsh_keys.npy"), model.neighbor_index.keys)
+        engine = {"mode": "ann", "metric": "cosine",
+                  "tables": int(model.neighbor_index.keys.shape[1])}
+    elif isinstance(model.neighbor_index, EmbeddingIndex):
+        index = model.neighbor_index
+        np.save(os.path.join(tmp_dir, "item_vectors.npy"), index.item_vectors)
+        np.save(os.path.join(tmp_dir, "item_norms.npy"), index.item_norms)
+        np.save(os.path.join(tmp_dir, "user_factors.npy"), index.user_factors)
+        np.save(os.path.join(tmp_dir, "singular_values.npy"), index.singular_values)
+        engine = {"mode": "svd", "metric": "cosine", "dims": index.dims}
+    _write_json(os.path.join(tmp_dir, "manifest.json"), {
+        "format": ARTIFACT_FORMAT,
+        "build_id": build_id,
+        "created_at": time.time(),
+        "shape": list(matrix.shape),
+        "nnz": int(matrix.nnz),
+        "updates_offset": model.updates_offset,
+        "engine": engine,
+        "sources": sources or {},
+        "report": report or {},
+    })
+
+    os.rename(tmp_dir, os.path.join(root, build_id))
+
+    pointer_tmp = os.path.join(root, f".{CURRENT_POINTER}.tmp")
+    with open(pointer_tmp, 'w') as f:
+        f.write(build_id)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_POINTER))
+
+    _prune_builds(root, keep=build_id)
+    return build_id
+
+
+def _prune_builds(root: str, keep: str):
+    builds = sorted(d for d in os.listdir(root)
+                    if not d.startswith(".") and os.path.isdir(os.path.join(root, d)))
+    for old in builds[:-KEEP_BUILDS]:
+        if old != keep:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def current_build_dir(root: str = ARTIFACTS_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), 'r') as f:
+            build_id = f.read().strip()
+    except OSError:
+        return None
+    build_dir = os.path.join(root, build_id)
+    return build_dir if os.path.isdir(build_dir) else None
+
+
+@span("load_artifacts")
+def load_model(root: str = ARTIFACTS_DIR) -> Optional[RecommenderModel]:
+    """
+    Loads the CURRENT build with its arrays memory-mapped read-only, so the
+    pages come from the OS page cache and are shared by every worker.
+
+    Returns:
+        Optional[RecommenderModel]: The model, or None if there is no usable build.
+    """
+    build_dir = current_build_dir(root)
+    if build_dir is None:
+        return None
+    with open(os.path.join(build_dir, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        return None
+
+    def mmap(name: str) -> np.ndarray:
+        return np.load(os.path.join(build_dir, name), mmap_mode='r')
+
+    matrix = csr_matrix(
+        (mmap("data.npy"), mmap("indices.npy"), mmap("indptr.npy")),
+        shape=tuple(manifest["shape"]), copy=False)
+    with open(os.path.join(build_dir, "titles.json"), 'r') as f:
+        titles = np.array(json.load(f), dtype=object)
+    with open(os.path.join(build_dir, "records.json"), 'r') as f:
+        records = json.load(f)
+
+    model = RecommenderModel(titles, mmap("user_ids.npy"), matrix, records,
+                             version=manifest["build_id"], movie_ids=mmap("movie_ids.npy"),
+                             movie_rows=mmap("movie_rows.npy"))
+    model.updates_offset = manifest.get("updates_offset", 0)
+    mode = manifest.get("engine", {}).get("mode")
+    if mode == "table":
+        model.neighbor_index = NeighborTable(
+            mmap("neighbors.npy"), mmap("neighbor_scores.npy"))
+    elif mode == "ann":
+        model.neighbor_index = LSHIndex(mmap("lsh_keys.npy"), matrix, model.norms)
+    elif mode == "svd":
+        model.neighbor_index = EmbeddingIndex(
+            mmap("item_vectors.npy"), mmap("item_norms.npy"),
+            mmap("user_factors.npy"), mmap("singular_values.npy"))
+    return model
@@ -0,0 +1,62 @@
+"""
+Offline model build.
+
+    python -m app.build_model [--out data/artifacts] [--engine table|ann|svd] [--neighbors K] [--dims D]
+
+Runs the preprocessing and training pipeline once and writes a versioned
+artifact build that the API memory-maps at startup. The build also prints
+(and stores in its manifest) a report comparing the chosen neighbor engine
+with the brute-force Euclidean search the API used to run per request, and
+lists titles that have ratings but no metadata row to hydrate them from.
+"""
+import argparse
+import json
+import os
+import time
+from app.artifacts import save_model
+from app.config import ARTIFACTS_DIR, MOVIES_METADATA_CSV, RATINGS_CSV
+from app.embeddings import DEFAULT_DIMS
+from app.neighbors import DEFAULT_NEIGHBORS, evaluate_engine
+from app.services.model_service import build_model
+
+
+def source_stamps() -> dict:
+    stamps = {}
+    for path in (MOVIES_METADATA_CSV, RATINGS_CSV):
+        st = os.stat(path)
+        stamps[os.path.basename(path)] = {
+            "size": st.st_size, "mtime": st.st_mtime}
+    return stamps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the recommendation model artifacts.")
+    parser.add_argument("--out", default=ARTIFACTS_DIR,
+                        help="artifact root directory (default: %(default)s)")
+    parser.add_argument("--engine", choices=["table", "ann", "svd"], default="table",
+                        help="neighbor engine: precomputed top-k cosine table, LSH "
+                             "approximate search or truncated-SVD embeddings (default: %(default)s)")
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS,
+                        help="neighbors stored per title in table mode (default: %(default)s)")
+    parser.add_argument("--dims", type=int, default=DEFAULT_DIMS,
+                        help="embedding size in svd mode (default: %(default)s)")
+    parser.add_argument("--no-report", action="store_true",
+                        help="skip the recall/latency comparison")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    model = build_model(engine=args.engine, neighbors=args.neighbors, dims=args.dims)
+    elapsed = time.perf_counter() - started
+    report = {} if args.no_report else evaluate_engine(model)
+    missing = [str(t) for t, r in zip(model.titles, model.records) if r is None]
+    report["hydration"] = {"titles": len(model.titles), "missing": len(missing),
+                           "missing_titles": missing[:20]}
+    build_id = save_model(model, args.out, sources=source_stamps(), report=report)
+    print(f"Built {build_id}: {model.matrix.shape[0]} titles x {model.matrix.shape[1]} users, "
+          f"{model.matrix.nnz} ratings in {elapsed:.1f}s -> {args.out}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/'
-DATA_DIR = os.path.join(os.path.dirname(BASE_DIR), "data")
+DATA_DIR = os.getenv("CINEVERSE_DATA_DIR", os.path.join(os.path.dirname(BASE_DIR), "data"))
 
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
+USERS_DB = os.path.join(DATA_DIR, "users.db")
+FAVORITES_JOURNAL = os.path.join(DATA_DIR, "favorites.journal")
 MOVIES_FILE = os.path.join(DATA_DIR, "movies.json")
+MOVIES_METADATA_CSV = os.path.join(DATA_DIR, "movies_metadata.csv")
+RATINGS_CSV = os.path.join(DATA_DIR, "ratings.csv")
+RATING_UPDATES_CSV = os.path.join(DATA_DIR, "rating_updates.csv")
+ARTIFACTS_DIR = os.path.join(DATA_DIR, "artifacts")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
@@ -0,0 +1,111 @@
+from typing import Optional, Tuple
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import svds
+import numpy as np
+from app.neighbors import _top_k
+
+# Embedding size of the "svd" engine; overridable on the command line
+DEFAULT_DIMS = 128
+
+
+def factorize(matrix: csr_matrix, dims: int = DEFAULT_DIMS, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Truncated SVD of the item x user rating matrix, M ~ (U S) V^T, with
+    missing ratings as zeros (PureSVD).
+
+    Args:
+        matrix (csr_matrix): Item x user rating matrix.
+        dims (int): Number of singular vectors kept, capped below min(matrix.shape).
+        seed (int): Seed of the solver's start vector, so builds are reproducible.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: float32 item factors U S (n_items x dims), user factors V (n_users x dims) and the singular values, largest first.
+    """
+    dims = max(1, min(dims, min(matrix.shape) - 1))
+    u, s, vt = svds(matrix.astype(np.float64), k=dims, random_state=seed)
+    order = np.argsort(-s)
+    s = s[order]
+    item_factors = (u[:, order] * s).astype(np.float32)
+    user_factors = np.ascontiguousarray(vt[order].T, dtype=np.float32)
+    return item_factors, user_factors, s.astype(np.float32)
+
+
+class EmbeddingIndex:
+    """
+    Dense low-rank embeddings of titles and users from a truncated SVD.
+
+    Titles are stored as unit vectors in one contiguous float32 matrix plus
+    their norms, so similar titles are a single matrix-vector product and a
+    user's predicted ratings are the same product with the user's factors,
+    scaled by the norms.
+    """
+
+    mode = "svd"
+
+    def __init__(self, item_vectors: np.ndarray, item_norms: np.ndarray,
+                 user_factors: np.ndarray, singular_values: np.ndarray):
+        self.item_vectors = item_vectors
+        self.item_norms = item_norms
+        self.user_factors = user_factors
+        self.singular_values = singular_values
+
+    @classmethod
+    def from_factors(cls, item_factors: np.ndarray, user_factors: np.ndarray,
+                     singular_values: np.ndarray) -> "EmbeddingIndex":
+        norms = np.linalg.norm(item_factors, axis=1).astype(np.float32)
+        scale = np.where(norms > 0, norms, 1.0).astype(np.float32)
+        vectors = np.ascontiguousarray(item_factors / scale[:, None], dtype=np.float32)
+        return cls(vectors, norms, user_factors, singular_values)
+
+    @property
+    def dims(self) -> int:
+        return self.item_vectors.shape[1]
+
+    def neighbors(self, row: int, n: int) -> np.ndarray:
+        return self.neighbors_many(np.array([row]), n)[0]
+
+    def neighbors_many(self, rows: np.ndarray, n: int) -> np.ndarray:
+        """
+        Top-`n` cosine neighbors of each of `rows`, from one matrix product.
+        """
+        scores = self.item_vectors[rows] @ self.item_vectors.T
+        scores[np.arange(len(rows)), rows] = -np.inf
+        n = min(n, scores.shape[1] - 1)
+        if n <= 0:
+            return np.empty((len(rows), 0), dtype=np.int64)
+        return _top_k(scores, n)
+
+    def user_scores(self, col: int) -> np.ndarray:
+        """
+        Predicted rating of every title for the user in matrix column `col`.
+        """
+        return self.item_norms * (self.item_vectors @ self.user_factors[col])
+
+    def project_users(self, ratings: csr_matrix) -> np.ndarray:
+        """
+        Least-squares user factors for rating rows (users x titles) against
+        the fixed item factors: V = R (U S) S^-2.
+        """
+        item_factors = self.item_vectors * self.item_norms[:, None]
+        factors = np.asarray(ratings @ item_factors) / np.square(self.singular_values)
+        return factors.astype(np.float32)
+
+    def with_users(self, matrix: csr_matrix, changed: np.ndarray,
+                   remap: Optional[np.ndarray] = None) -> "EmbeddingIndex":
+        """
+        Copy with the factors of the users in columns `changed` recomputed
+        from their ratings in `matrix`. `remap` is the new column of every old
+        user when columns were added. Title embeddings keep their values
+        until the next full build.
+        """
+        factors = np.asarray(self.user_factors)
+        if remap is not None:
+            grown = np.zeros((matrix.shape[1], self.dims), dtype=np.float32)
+            grown[remap] = factors
+            factors = grown
+        else:
+            factors = np.array(factors)
+        changed = np.unique(np.asarray(changed, dtype=np.int64))
+        if len(changed):
+            factors[changed] = self.project_users(matrix[:, changed].T.tocsr())
+        return EmbeddingIndex(self.item_vectors, self.item_norms, factors, self.singular_values)
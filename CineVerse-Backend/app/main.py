@@ -1,8 +1,29 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.routes import auth, movies
+from app.services import metrics, model_service
+from app.services.rating_updates import rating_ingestor
 
-app = FastAPI(title="CineVerse API")
+
+def load_recommender():
+    """
+    Loads the recommendation model and folds in the journaled rating updates
+    it does not contain yet.
+    """
+    model_service.load_model()
+    rating_ingestor.replay_journal()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve right away; routes that need the model answer 503 until it is loaded
+    model_service.start_loading(load_recommender)
+    yield
+
+
+app = FastAPI(title="CineVerse API", lifespan=lifespan)
 
 origins = [
     "*",
@@ -15,11 +36,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(auth.router, prefix="/api", tags=["Authentication"])
 app.include_router(movies.router, prefix="/api", tags=["Movies"])
 
 
+@app.exception_handler(model_service.ModelNotReady)
+async def model_not_ready(request: Request, exc: model_service.ModelNotReady):
+    return JSONResponse(status_code=503, content={"detail": exc.detail},
+                        headers={"Retry-After": str(model_service.RETRY_AFTER)})
+
+
 @app.get("/", tags=["Root"])
 async def main():
     return {"message": "Welcome to the CineVerse API"}
+
+
+@app.get("/health/live", tags=["Health"])
+async def health_live():
+    """
+    The process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", tags=["Health"])
+async def health_ready():
+    """
+    200 once the recommendation model is loaded, 503 while it is loading or
+    if loading failed.
+    """
+    state = model_service.model_status()
+    if state["ready"]:
+        return {"status": "ready", "model_version": state["model_version"]}
+    content = {"status": "failed" if state["error"] else "loading", "detail": state["error"]}
+    return JSONResponse(status_code=503, content=content,
+                        headers={"Retry-After": str(model_service.RETRY_AFTER)})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus text exposition of request, pipeline, cache and model metrics.
+    """
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
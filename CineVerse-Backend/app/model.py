@@ -1,28 +1,404 @@
-from typing import Tuple
-from scipy.sparse import csr_matrix
-from sklearn.neighbors import NearestNeighbors
+import ast
+import logging
+from typing import List, Optional, Tuple
+from scipy.sparse import coo_matrix, csr_matrix
+import numpy as np
 import pandas as pd
+from app.embeddings import DEFAULT_DIMS, EmbeddingIndex, factorize
+from app.neighbors import DEFAULT_NEIGHBORS, LSHIndex, NeighborTable, _top_k, build_neighbor_table, lsh_keys, update_neighbor_table
+from app.services.metrics import span
 
+logger = logging.getLogger(__name__)
 
-def train_model(movies_processed: pd.DataFrame, ratings_processed: pd.DataFrame) -> Tuple[NearestNeighbors, pd.DataFrame, csr_matrix]:
+
+class RecommenderModel:
     """
-    Trains a model for movie recommendation based on processed movie and rating data.
+    Item-based recommendation model: one row of user ratings per title.
+
+    `titles[i]` names row `i` of `matrix`, `user_ids[j]` names column `j` and
+    `records[i]` is the MovieBase-ready metadata of row `i` (None if missing).
+    `movie_ids`/`movie_rows` map MovieLens movie ids (sorted) to rows.
+    The arrays may be memory-mapped artifacts, so nothing here writes to them.
+    Similar titles come from `neighbor_index` (a precomputed cosine table, an
+    LSH index or SVD embeddings); without one the brute-force Euclidean
+    search is used.
+    """
+
+    def __init__(self, titles: np.ndarray, user_ids: np.ndarray, matrix: csr_matrix,
+                 records: List[Optional[dict]], version: str = "in-process", neighbor_index=None,
+                 movie_ids: Optional[np.ndarray] = None, movie_rows: Optional[np.ndarray] = None):
+        self.titles = titles
+        self.user_ids = user_ids
+        self.matrix = matrix
+        self.records = records
+        self.movie_ids = movie_ids if movie_ids is not None else np.empty(0, dtype=np.int64)
+        self.movie_rows = movie_rows if movie_rows is not None else np.empty(0, dtype=np.int32)
+        # Journal position (bytes) of the rating updates already in this model
+        self.updates_offset = 0
+        self.missing_records = sum(1 for r in records if r is None)
+        self.version = version
+        # Squared row norms for brute-force Euclidean search
+        self._sq_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        self.norms = np.sqrt(self._sq_norms)
+        self.neighbor_index = neighbor_index
+
+    def rows_for_movies(self, movie_ids: np.ndarray) -> np.ndarray:
+        """
+        Model rows of MovieLens `movie_ids`, -1 for ids the model does not know.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self.movie_ids) == 0:
+            return np.full(len(movie_ids), -1, dtype=np.int64)
+        pos = np.clip(np.searchsorted(self.movie_ids, movie_ids), 0, len(self.movie_ids) - 1)
+        found = self.movie_ids[pos] == movie_ids
+        return np.where(found, self.movie_rows[pos], -1)
+
+    def user_column(self, user_id: int) -> int:
+        """
+        Matrix column of MovieLens user `user_id`, -1 if the model does not know them.
+        """
+        user_ids = self.user_ids
+        col = int(np.searchsorted(user_ids, user_id))
+        return col if col < len(user_ids) and user_ids[col] == user_id else -1
+
+    def user_ratings(self, col: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows rated by the user in column `col` and their ratings. Scans the
+        column indices once, which keeps the matrix in its memory-mapped CSR form.
+        """
+        hits = np.flatnonzero(self.matrix.indices == col)
+        rows = np.searchsorted(self.matrix.indptr, hits, side='right') - 1
+        return rows, np.asarray(self.matrix.data[hits], dtype=np.float64)
+
+    def recommend_for_user(self, col: int, n: int = 10) -> List[Tuple[int, float, int]]:
+        """
+        Titles the user in column `col` has not rated, best first, each with
+        the rated title that explains it ("because you rated ...").
+
+        With SVD embeddings the score is the predicted rating and the reason
+        is the closest well-rated title. With a neighbor table the score is
+        item-based: the neighbor similarities of the user's titles weighted
+        by their ratings, and the reason is the title contributing most.
+
+        Returns:
+            List[Tuple[int, float, int]]: (row, score, reason row) triples.
+
+        Raises:
+            ValueError: The neighbor engine cannot score users.
+        """
+        rated, ratings = self.user_ratings(col)
+        if len(rated) == 0:
+            return []
+        index = self.neighbor_index
+        if isinstance(index, EmbeddingIndex):
+            scores = index.user_scores(col)
+            scores[rated] = -np.inf
+            n = min(n, len(scores) - len(rated))
+            if n <= 0:
+                return []
+            top = _top_k(scores[None, :], n)[0]
+            liked = rated[ratings >= ratings.mean()]
+            reasons = liked[np.argmax(index.item_vectors[liked] @ index.item_vectors[top].T, axis=0)]
+            return list(zip(top.tolist(), scores[top].tolist(), reasons.tolist()))
+        if isinstance(index, NeighborTable):
+            neighbors = np.asarray(index.indices[rated], dtype=np.int64).ravel()
+            weights = (np.asarray(index.scores[rated], dtype=np.float64) * ratings[:, None]).ravel()
+            sources = np.repeat(rated, index.k)
+            keep = ~np.isin(neighbors, rated) & (weights > 0)
+            neighbors, weights, sources = neighbors[keep], weights[keep], sources[keep]
+            if len(neighbors) == 0:
+                return []
+            candidates, inverse = np.unique(neighbors, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+            top = _top_k(scores[None, :], min(n, len(candidates)))[0]
+            # The strongest contribution per candidate: sort by candidate, then weight
+            order = np.lexsort((-weights, inverse))
+            first = order[np.searchsorted(inverse[order], top)]
+            return list(zip(candidates[top].tolist(), scores[top].tolist(), sources[first].tolist()))
+        raise ValueError("User recommendations need a model built with the table or svd engine")
+
+    def hydrate(self, rows: np.ndarray) -> List[dict]:
+        """
+        Metadata records for `rows` in order, skipping rows without metadata.
+        """
+        records = self.records
+        return [records[i] for i in rows.tolist() if records[i] is not None]
+
+    def similar(self, row: int, n: int = 5) -> np.ndarray:
+        """
+        Row indices of the `n` titles most similar to `row`, the title itself first.
+        """
+        if self.neighbor_index is None:
+            return self.kneighbors(row, n)[1]
+        return np.concatenate(([row], self.neighbor_index.neighbors(row, n - 1))).astype(np.int64)
+
+    def similar_many(self, rows: np.ndarray, n: int = 5) -> List[np.ndarray]:
+        """
+        `similar` for several titles with one lookup in the neighbor engine
+        (one table gather, one matrix product or one stacked kneighbors call);
+        LSH queries still run per title.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return []
+        index = self.neighbor_index
+        if index is None:
+            return list(self.kneighbors_many(rows, n)[1])
+        if isinstance(index, (NeighborTable, EmbeddingIndex)):
+            found = np.asarray(index.neighbors_many(rows, n - 1), dtype=np.int64)
+            return list(np.hstack([rows[:, None], found]))
+        return [self.similar(int(row), n) for row in rows]
+
+    def kneighbors(self, row: int, n_neighbors: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force Euclidean nearest neighbors of title `row`, the same search
+        NearestNeighbors(algorithm='brute') performs, without copying the matrix.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distances and row indices, nearest first.
+        """
+        distances, nearest = self.kneighbors_many(np.array([row]), n_neighbors)
+        return distances[0], nearest[0]
+
+    def kneighbors_many(self, rows: np.ndarray, n_neighbors: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        `kneighbors` for the stacked query `rows`: one sparse product for all
+        of them.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distances and row indices, one row per query, nearest first.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        dots = (self.matrix[rows] @ self.matrix.T).toarray()
+        sq_dist = np.maximum(self._sq_norms[rows][:, None] + self._sq_norms[None, :] - 2 * dots, 0)
+        n_neighbors = min(n_neighbors, sq_dist.shape[1])
+        nearest = np.argpartition(sq_dist, n_neighbors - 1, axis=1)[:, :n_neighbors]
+        nearest_dist = np.take_along_axis(sq_dist, nearest, axis=1)
+        nearest = np.take_along_axis(nearest, np.lexsort((nearest, nearest_dist), axis=1), axis=1)
+        return np.sqrt(np.take_along_axis(sq_dist, nearest, axis=1)), nearest
+
+
+def build_rating_matrix(movies_processed: pd.DataFrame, ratings_processed: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, csr_matrix]:
+    """
+    Builds the titles x users rating matrix directly in sparse form.
+
+    Produces the same matrix as pivoting the merged ratings on TITLE/USER_ID
+    (duplicates dropped, ratings of one user for several ids sharing a title
+    averaged, missing ratings as 0) without ever materializing the dense pivot.
 
     Args:
         movies_processed (pd.DataFrame): Processed movie data.
         ratings_processed (pd.DataFrame): Processed rating data.
 
     Returns:
-        Tuple[NearestNeighbors, pd.DataFrame, csr_matrix]: A tuple containing the trained model, the pivot table of movies, and the sparse matrix representation of the pivot table.
+        Tuple[np.ndarray, np.ndarray, csr_matrix]: Row titles (sorted), column user ids (sorted) and the sparse rating matrix.
+    """
+    # The merge used to pair every rating with the first movie row for its id
+    title_by_id = movies_processed.drop_duplicates('MOVIE_ID').set_index('MOVIE_ID')['TITLE']
+
+    ratings = ratings_processed[['USER_ID', 'MOVIE_ID', 'RATING']]
+    ratings = ratings[ratings['MOVIE_ID'].isin(title_by_id.index)]
+    ratings = ratings.drop_duplicates(['USER_ID', 'MOVIE_ID'])
+
+    titles = pd.Categorical(ratings['MOVIE_ID'].map(title_by_id))
+    users = pd.Categorical(ratings['USER_ID'])
+    shape = (len(titles.categories), len(users.categories))
+    rows = titles.codes.astype(np.int32)
+    cols = users.codes.astype(np.int32)
+
+    # Summing duplicates and dividing by their count averages ratings of one
+    # user for several movie ids that share a title, as pivot_table did
+    sums = coo_matrix((ratings['RATING'].to_numpy(dtype=np.float64), (rows, cols)), shape=shape).tocsr()
+    counts = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=shape).tocsr()
+    sums.data /= counts.data
+    sums.eliminate_zeros()
+
+    user_ids = users.categories.to_numpy()
+    if user_ids.dtype.kind in 'iu' and (len(user_ids) == 0 or user_ids.max() < np.iinfo(np.int32).max):
+        user_ids = user_ids.astype(np.int32)
+    return titles.categories.to_numpy(dtype=object), user_ids, sums
+
+
+def movie_record(row: pd.Series) -> dict:
+    """
+    Converts one movies_metadata.csv row into a MovieBase-ready dict.
+    """
+    # Some fields may need conversion/handling if missing
+    try:
+        release_year = int(str(row['release_date'])[:4]) if pd.notnull(
+            row['release_date']) else 0
+    except Exception:
+        release_year = 0
+    # Genres parsing (assume genres is a stringified list of dicts)
+    genres = []
+    try:
+        genres_list = ast.literal_eval(
+            row['genres']) if pd.notnull(row['genres']) else []
+        genres = [g['name'] for g in genres_list if 'name' in g]
+    except Exception:
+        genres = []
+    try:
+        rating = float(row['vote_average']) if pd.notnull(row.get('vote_average')) else 0.0
+    except (TypeError, ValueError):
+        rating = 0.0
+    poster_path = row['poster_path']
+    return {
+        'id': str(row['id']),
+        'title': str(row['original_title']),
+        'description': row['overview'] if pd.notnull(row['overview']) else '',
+        'releaseYear': release_year,
+        'duration': str(row['runtime']) if pd.notnull(row.get('runtime')) else '',
+        'rating': rating,
+        'genres': genres,
+        'moods': [],
+        'poster_path': poster_path if isinstance(poster_path, str) and 'http' in poster_path else '',
+    }
+
+
+def build_movie_records(movies: pd.DataFrame, titles: np.ndarray) -> Tuple[List[Optional[dict]], List[str]]:
+    """
+    Builds one MovieBase-ready record per model row.
+
+    When several metadata rows share a title the first one in file order wins,
+    which is the row the per-request lookup used to pick.
+
+    Returns:
+        Tuple[List[Optional[dict]], List[str]]: Records aligned with `titles` (None where no metadata row exists) and the titles without metadata.
     """
-    df = ratings_processed.merge(movies_processed, on='MOVIE_ID').drop_duplicates([
-        'USER_ID', 'MOVIE_ID'])
+    metadata = movies[movies['original_title'].isin(set(titles))]
+    metadata = metadata.drop_duplicates('original_title').set_index('original_title', drop=False)
+    records: List[Optional[dict]] = []
+    missing: List[str] = []
+    for title in titles:
+        if title in metadata.index:
+            records.append(movie_record(metadata.loc[title]))
+        else:
+            records.append(None)
+            missing.append(str(title))
+    return records, missing
+
+
+def build_movie_index(movies_processed: pd.DataFrame, titles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maps MovieLens movie ids to model rows through their (first) title.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Sorted int64 movie ids and their int32 rows.
+    """
+    title_by_id = movies_processed.drop_duplicates('MOVIE_ID')
+    rows = pd.Index(titles).get_indexer(title_by_id['TITLE'])
+    movie_ids = title_by_id['MOVIE_ID'].to_numpy().astype(np.int64)[rows >= 0]
+    rows = rows[rows >= 0]
+    order = np.argsort(movie_ids, kind='stable')
+    return movie_ids[order], rows[order].astype(np.int32)
+
+
+@span("fold_in")
+def fold_in(model: RecommenderModel, movie_ids: np.ndarray, user_ids: np.ndarray,
+            ratings: np.ndarray) -> RecommenderModel:
+    """
+    Returns a new model with the given ratings written into the matrix.
+
+    A new rating replaces any existing rating of that user for the title,
+    unknown users get new columns and unknown movies are ignored. Only the
+    neighbor lists touched by the changed titles are recomputed; `model`
+    itself is left untouched so it can keep serving in-flight requests.
+    """
+    rows = model.rows_for_movies(movie_ids)
+    known = rows >= 0
+    rows = rows[known]
+    user_ids = np.asarray(user_ids, dtype=np.int64)[known]
+    ratings = np.asarray(ratings, dtype=np.float64)[known]
+
+    old_users = np.asarray(model.user_ids)
+    bounds = np.iinfo(old_users.dtype)
+    if len(user_ids) and (user_ids.min() < bounds.min or user_ids.max() > bounds.max):
+        raise ValueError(f"User ids must fit in {old_users.dtype}")
+    new_users = np.union1d(old_users, user_ids).astype(old_users.dtype)
+    base = model.matrix
+    remap = None
+    if len(new_users) != len(old_users):
+        # Old users keep their relative order, so every row stays sorted
+        remap = np.searchsorted(new_users, old_users).astype(np.int32)
+        base = csr_matrix((base.data, remap[base.indices], base.indptr),
+                          shape=(base.shape[0], len(new_users)))
 
-    movies_pivot = df.pivot_table(
-        columns='USER_ID', index='TITLE', values='RATING').fillna(0)
-    movies_sparse = csr_matrix(movies_pivot)
+    shape = (base.shape[0], len(new_users))
+    cols = np.searchsorted(new_users, user_ids)
+    # The last event for a cell wins
+    cells = pd.DataFrame({'row': rows, 'col': cols, 'rating': ratings}).drop_duplicates(
+        ['row', 'col'], keep='last')
+    delta = csr_matrix((cells['rating'].to_numpy(), (cells['row'].to_numpy(), cells['col'].to_numpy())), shape=shape)
+    mask = csr_matrix((np.ones(len(cells)), (cells['row'].to_numpy(), cells['col'].to_numpy())), shape=shape)
+    matrix = (base - base.multiply(mask) + delta).tocsr()
+    matrix.eliminate_zeros()
+
+    updated = RecommenderModel(model.titles, new_users, matrix, model.records,
+                               version=model.version, movie_ids=model.movie_ids,
+                               movie_rows=model.movie_rows)
+    changed = np.unique(cells['row'].to_numpy())
+    index = model.neighbor_index
+    if isinstance(index, NeighborTable):
+        updated.neighbor_index = NeighborTable(
+            *update_neighbor_table(index.indices, index.scores, matrix, changed))
+    elif isinstance(index, LSHIndex):
+        updated.neighbor_index = LSHIndex(lsh_keys(matrix), matrix, updated.norms)
+    elif isinstance(index, EmbeddingIndex):
+        updated.neighbor_index = index.with_users(matrix, np.unique(cols), remap)
+    return updated
+
+
+def build_neighbor_index(matrix: csr_matrix, norms: np.ndarray, engine: str = "table",
+                         neighbors: int = DEFAULT_NEIGHBORS, dims: int = DEFAULT_DIMS):
+    """
+    Builds the neighbor engine selected at build time: "table" precomputes the
+    top-`neighbors` cosine list per title, "ann" builds an LSH index and "svd"
+    factorizes the matrix into `dims`-dimensional title and user embeddings.
+    """
+    if engine == "table":
+        return NeighborTable(*build_neighbor_table(matrix, k=neighbors))
+    if engine == "ann":
+        return LSHIndex(lsh_keys(matrix), matrix, norms)
+    if engine == "svd":
+        return EmbeddingIndex.from_factors(*factorize(matrix, dims=dims))
+    raise ValueError(f"Unknown neighbor engine: {engine}")
+
+
+@span("train_model")
+def train_model(movies_processed: pd.DataFrame, ratings_processed: pd.DataFrame, movies: Optional[pd.DataFrame] = None,
+                engine: str = "table", neighbors: int = DEFAULT_NEIGHBORS,
+                dims: int = DEFAULT_DIMS) -> RecommenderModel:
+    """
+    Trains a model for movie recommendation based on processed movie and rating data.
+
+    Args:
+        movies_processed (pd.DataFrame): Processed movie data.
+        ratings_processed (pd.DataFrame): Processed rating data.
+        movies (pd.DataFrame, optional): Raw movie metadata used to build the hydration records.
+        engine (str): Neighbor engine, "table" (precomputed top-k cosine), "ann" (LSH) or "svd" (embeddings).
+        neighbors (int): Neighbors precomputed per title in "table" mode.
+        dims (int): Embedding size in "svd" mode.
+
+    Returns:
+        RecommenderModel: The trained model with its title index, rating matrix and metadata records.
+    """
+    with span("train_model.rating_matrix"):
+        titles, user_ids, movies_sparse = build_rating_matrix(
+            movies_processed, ratings_processed)
+    with span("train_model.movie_records"):
+        if movies is not None:
+            records, missing = build_movie_records(movies, titles)
+            if missing:
+                logger.warning("%d of %d titles have no metadata and cannot be recommended, e.g. %s",
+                               len(missing), len(titles), missing[:20])
+        else:
+            records = [None] * len(titles)
 
-    model = NearestNeighbors(algorithm='brute')
-    model.fit(movies_sparse)
+        movie_ids, movie_rows = build_movie_index(movies_processed, titles)
 
-    return model, movies_pivot, movies_sparse
+    model = RecommenderModel(titles, user_ids, movies_sparse, records,
+                             movie_ids=movie_ids, movie_rows=movie_rows)
+    with span(f"train_model.neighbors_{engine}"):
+        model.neighbor_index = build_neighbor_index(
+            movies_sparse, model.norms, engine=engine, neighbors=neighbors, dims=dims)
+    return model
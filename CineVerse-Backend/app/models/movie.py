@@ -1,15 +1,83 @@
-from typing import List, Optional
+import sys
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+Codes = Union[bytes, array]
+
+
+class Vocabulary:
+    """
+    Interns labels such as genre names. A movie stores the codes of its
+    labels as bytes (array('H') once there are more than 256 labels)
+    instead of a list of strings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+
+    def code(self, label: str) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(label)
+                if code is None:
+                    code = self._codes[label] = len(self.labels)
+                    self.labels.append(sys.intern(label))
+        return code
+
+    def encode(self, labels: Iterable[str]) -> Codes:
+        codes = [self.code(label) for label in labels]
+        if all(c < 256 for c in codes):
+            return bytes(codes)
+        return array('H', codes)
+
+    def decode(self, codes: Codes) -> List[str]:
+        labels = self.labels
+        return [labels[c] for c in codes]
+
+
+GENRES = Vocabulary()
+MOODS = Vocabulary()
 
 
 class Movie:
+    __slots__ = ('id', 'title', 'description', 'releaseYear', 'duration', 'rating',
+                 'genre_codes', 'mood_codes', 'poster_path')
+
+    FIELDS = ('id', 'title', 'description', 'releaseYear', 'duration', 'rating',
+              'genres', 'moods', 'poster_path')
+
     def __init__(self, id: str, title: str, description: str, releaseYear: int,
                  duration: str, rating: float, genres: List[str], moods: List[str], poster_path: str):
         self.id = id
         self.title = title
         self.description = description
         self.releaseYear = releaseYear
-        self.duration = duration
+        # Few distinct values, shared across the catalog
+        self.duration = sys.intern(duration) if isinstance(duration, str) else duration
         self.rating = rating
-        self.genres = genres if genres is not None else []
-        self.moods = moods if moods is not None else []
+        self.genres = genres
+        self.moods = moods
         self.poster_path = poster_path
+
+    @property
+    def genres(self) -> List[str]:
+        return GENRES.decode(self.genre_codes)
+
+    @genres.setter
+    def genres(self, genres: Optional[Sequence[str]]):
+        self.genre_codes = GENRES.encode(genres if genres is not None else [])
+
+    @property
+    def moods(self) -> List[str]:
+        return MOODS.decode(self.mood_codes)
+
+    @moods.setter
+    def moods(self, moods: Optional[Sequence[str]]):
+        self.mood_codes = MOODS.encode(moods if moods is not None else [])
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
@@ -2,6 +2,8 @@ from typing import List
 
 
 class User:
+    __slots__ = ('id', 'name', 'email', 'password', 'favorites')
+
     def __init__(self, id: str, name: str, email: str, password: str, favorites: List[str]):
         self.id = id
         self.name = name
@@ -0,0 +1,230 @@
+import time
+from typing import Dict, List, Optional, Tuple
+from scipy.sparse import csr_matrix, diags
+import numpy as np
+
+# Defaults for the offline build; both can be overridden on the command line
+DEFAULT_NEIGHBORS = 20
+DEFAULT_BLOCK_SIZE = 1024
+
+# Random-hyperplane LSH settings for the approximate mode
+LSH_TABLES = 8
+LSH_MAX_BITS = 16
+LSH_BUCKET_TARGET = 32
+
+
+def normalize_rows(matrix: csr_matrix) -> csr_matrix:
+    """
+    Scales every row to unit L2 norm so that dot products are cosine similarities.
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (diags(1.0 / norms) @ matrix).tocsr()
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Column indices of the k largest scores per row, best first (ties by index).
+    """
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.lexsort((part, -part_scores), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _exact_rows(normalized: csr_matrix, transposed: csr_matrix, rows: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+    block = (normalized[rows] @ transposed).toarray()
+    block[np.arange(len(rows)), rows] = -np.inf
+    top = _top_k(block, k)
+    return top, np.take_along_axis(block, top, axis=1)
+
+
+def build_neighbor_table(matrix: csr_matrix, k: int = DEFAULT_NEIGHBORS,
+                         block_size: int = DEFAULT_BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the top-k cosine neighbors of every row using blocked sparse
+    products, so only a block_size x n_rows dense slab exists at any time.
+
+    Args:
+        matrix (csr_matrix): Item x user rating matrix.
+        k (int): Neighbors kept per row (the row itself is excluded).
+        block_size (int): Rows multiplied per block.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: int32 neighbor rows and float32 cosine similarities, both n_rows x k.
+    """
+    n_rows = matrix.shape[0]
+    k = max(0, min(k, n_rows - 1))
+    normalized = normalize_rows(matrix)
+    transposed = normalized.T.tocsc()
+    indices = np.empty((n_rows, k), dtype=np.int32)
+    scores = np.empty((n_rows, k), dtype=np.float32)
+    if k == 0:
+        return indices, scores
+
+    for start in range(0, n_rows, block_size):
+        rows = np.arange(start, min(start + block_size, n_rows))
+        indices[rows], scores[rows] = _exact_rows(normalized, transposed, rows, k)
+    return indices, scores
+
+
+def update_neighbor_table(indices: np.ndarray, scores: np.ndarray, matrix: csr_matrix,
+                          changed: np.ndarray, block_size: int = DEFAULT_BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Refreshes a neighbor table after the rows in `changed` were edited.
+
+    Changed rows get a full recomputation. Every other row keeps its list,
+    with the similarities to changed rows swapped for fresh values, so the
+    cost scales with len(changed) rather than with the whole table. When a
+    changed title drops out of a list, the slot is refilled from the changed
+    titles and the list itself. A title that was not listed before can
+    therefore be missed until the next full build.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: New neighbor rows and similarities (the inputs are not modified).
+    """
+    changed = np.unique(np.asarray(changed, dtype=np.int64))
+    n_rows, k = indices.shape
+    indices = np.array(indices)
+    scores = np.array(scores)
+    if k == 0 or len(changed) == 0:
+        return indices, scores
+    if len(changed) * 4 > n_rows:
+        return build_neighbor_table(matrix, k=k, block_size=block_size)
+
+    normalized = normalize_rows(matrix)
+    changed_t = normalized[changed].T.tocsc()
+    for start in range(0, n_rows, block_size):
+        rows = np.arange(start, min(start + block_size, n_rows))
+        fresh = (normalized[rows] @ changed_t).toarray()
+        fresh[rows[:, None] == changed[None, :]] = -np.inf
+        stale = np.isin(indices[rows], changed)
+        kept = np.where(stale, -np.inf, scores[rows])
+        candidates = np.hstack([indices[rows], np.broadcast_to(changed, fresh.shape)])
+        candidate_scores = np.hstack([kept, fresh])
+        top = _top_k(candidate_scores, k)
+        indices[rows] = np.take_along_axis(candidates, top, axis=1)
+        scores[rows] = np.take_along_axis(candidate_scores, top, axis=1)
+
+    transposed = normalized.T.tocsc()
+    for start in range(0, len(changed), block_size):
+        rows = changed[start:start + block_size]
+        indices[rows], scores[rows] = _exact_rows(normalized, transposed, rows, k)
+    return indices, scores
+
+
+class NeighborTable:
+    """
+    Precomputed neighbor lists: serving a title is a single row lookup.
+    """
+
+    mode = "table"
+
+    def __init__(self, indices: np.ndarray, scores: np.ndarray):
+        self.indices = indices
+        self.scores = scores
+
+    @property
+    def k(self) -> int:
+        return self.indices.shape[1]
+
+    def neighbors(self, row: int, n: int) -> np.ndarray:
+        return np.asarray(self.indices[row, :n])
+
+    def neighbors_many(self, rows: np.ndarray, n: int) -> np.ndarray:
+        return np.asarray(self.indices[rows, :n])
+
+
+def lsh_keys(matrix: csr_matrix, tables: int = LSH_TABLES, bits: Optional[int] = None,
+             seed: int = 0) -> np.ndarray:
+    """
+    Random-hyperplane signatures of every row, one `bits`-bit bucket key per table.
+    By default `bits` is chosen so buckets hold about LSH_BUCKET_TARGET titles.
+    Hyperplanes are generated one table at a time to bound build memory.
+    """
+    if bits is None:
+        ratio = max(matrix.shape[0] / LSH_BUCKET_TARGET, 1)
+        bits = int(min(LSH_MAX_BITS, max(1, round(np.log2(ratio)))))
+    rng = np.random.default_rng(seed)
+    weights = (1 << np.arange(bits)).astype(np.uint32)
+    keys = np.empty((matrix.shape[0], tables), dtype=np.uint32)
+    for t in range(tables):
+        planes = rng.standard_normal((matrix.shape[1], bits)).astype(np.float32)
+        signs = np.asarray(matrix @ planes) > 0
+        keys[:, t] = signs.astype(np.uint32) @ weights
+    return keys
+
+
+class LSHIndex:
+    """
+    Approximate cosine neighbors for catalogs too large to precompute a table.
+
+    Candidates are the titles sharing a bucket with the query in any table;
+    they are then re-ranked with exact cosine similarity.
+    """
+
+    mode = "ann"
+
+    def __init__(self, keys: np.ndarray, matrix: csr_matrix, norms: np.ndarray):
+        self.keys = keys
+        self.matrix = matrix
+        self.norms = norms
+        self._buckets: List[Dict[int, np.ndarray]] = []
+        for t in range(keys.shape[1]):
+            column = np.asarray(keys[:, t])
+            order = np.argsort(column, kind='stable')
+            bucket_ids, starts = np.unique(column[order], return_index=True)
+            groups = np.split(order.astype(np.int32), starts[1:])
+            self._buckets.append(dict(zip(bucket_ids.tolist(), groups)))
+
+    def neighbors(self, row: int, n: int) -> np.ndarray:
+        candidates = np.unique(np.concatenate(
+            [self._buckets[t][int(self.keys[row, t])] for t in range(self.keys.shape[1])]))
+        candidates = candidates[candidates != row]
+        if n <= 0 or len(candidates) == 0:
+            return np.empty(0, dtype=np.int32)
+        dots = (self.matrix[candidates] @ self.matrix[row].T).toarray().ravel()
+        denom = self.norms[candidates] * self.norms[row]
+        scores = np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+        n = min(n, len(candidates))
+        return candidates[_top_k(scores[None, :], n)[0]]
+
+
+def evaluate_engine(model, k: int = 10, sample: int = 200, seed: int = 0) -> dict:
+    """
+    Compares the served neighbor engine with the brute-force Euclidean search
+    the API used before, and (in ANN and SVD mode) with exact cosine neighbors.
+
+    Returns:
+        dict: Overlap@k figures and mean per-query latencies in milliseconds.
+    """
+    n_rows = model.matrix.shape[0]
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(n_rows, size=min(sample, n_rows), replace=False)
+    k = min(k, n_rows - 1)
+    report = {"mode": model.neighbor_index.mode, "k": k, "sample": len(rows)}
+    if k <= 0:
+        return report
+
+    def timed(fn):
+        results, started = [], time.perf_counter()
+        for row in rows:
+            results.append(set(fn(int(row)).tolist()) - {int(row)})
+        return results, (time.perf_counter() - started) * 1000 / len(rows)
+
+    served, served_ms = timed(lambda r: model.neighbor_index.neighbors(r, k))
+    brute, brute_ms = timed(lambda r: model.kneighbors(r, k + 1)[1])
+    report["served_ms"] = served_ms
+    report["brute_force_euclidean_ms"] = brute_ms
+    report["overlap_with_brute_force_euclidean"] = float(np.mean(
+        [len(s & b) / k for s, b in zip(served, brute)]))
+
+    if model.neighbor_index.mode in ("ann", "svd"):
+        normalized = normalize_rows(model.matrix)
+        sims = (normalized[rows] @ normalized.T).toarray()
+        sims[np.arange(len(rows)), rows] = -np.inf
+        exact = [set(r.tolist()) for r in _top_k(sims, k)]
+        report["recall_vs_exact_cosine"] = float(np.mean(
+            [len(s & e) / k for s, e in zip(served, exact)]))
+    return report
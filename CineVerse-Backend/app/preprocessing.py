@@ -1,48 +1,205 @@
-from typing import Tuple
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+from typing import Iterable, Optional, Tuple
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from app.config import CACHE_DIR, MOVIES_METADATA_CSV, RATING_UPDATES_CSV, RATINGS_CSV
+from app.services.metrics import record_cache, span
+
+logger = logging.getLogger(__name__)
+
+# Only these columns of movies_metadata.csv are used: the first four for
+# filtering, the rest to hydrate recommendations
+MOVIE_COLUMNS = ['id', 'original_title', 'original_language', 'vote_count',
+                 'overview', 'release_date', 'runtime', 'vote_average',
+                 'genres', 'poster_path']
+RATING_DTYPES = {'userId': np.int32, 'movieId': np.int32, 'rating': np.float32}
+RATINGS_CHUNK_SIZE = 2_000_000
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 23), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@span("load_movies")
+def load_movies() -> pd.DataFrame:
+    """
+    Load the movies metadata, restricted to the columns the pipeline uses.
+
+    Returns:
+        pd.DataFrame: The movies dataframe.
+    """
+    header = pd.read_csv(MOVIES_METADATA_CSV, nrows=0).columns
+    return pd.read_csv(MOVIES_METADATA_CSV, low_memory=False,
+                       usecols=[c for c in MOVIE_COLUMNS if c in header])
+
+
+@span("load_ratings_csv")
+def _read_ratings_csv(movie_ids: Optional[np.ndarray]) -> pd.DataFrame:
+    chunks = []
+    for chunk in pd.read_csv(RATINGS_CSV, usecols=list(RATING_DTYPES),
+                             dtype=RATING_DTYPES, chunksize=RATINGS_CHUNK_SIZE):
+        if movie_ids is not None:
+            chunk = chunk[chunk['movieId'].isin(movie_ids)]
+        chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame({c: np.empty(0, dtype=t) for c, t in RATING_DTYPES.items()})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_ratings(movie_ids: Optional[Iterable[int]] = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Stream ratings.csv in chunks with compact dtypes, keeping only ratings of
+    `movie_ids` (all ratings if None).
+
+    The filtered columns are cached as .npy files keyed by the hash of the
+    CSV and of the id filter, so later runs skip CSV parsing entirely.
+
+    Returns:
+        pd.DataFrame: userId (int32), movieId (int32) and rating (float32).
+    """
+    ids = None if movie_ids is None else np.unique(np.asarray(list(movie_ids), dtype=np.int64))
+    if not use_cache:
+        return _read_ratings_csv(ids)
+
+    key = hashlib.blake2b(digest_size=16)
+    key.update(_file_digest(RATINGS_CSV).encode())
+    key.update(b'all' if ids is None else ids.tobytes())
+    cache_dir = os.path.join(CACHE_DIR, f"ratings-{key.hexdigest()}")
+
+    if os.path.isdir(cache_dir):
+        record_cache("ratings_npy", hits=1)
+        with span("load_ratings_cache"):
+            return pd.DataFrame({c: np.load(os.path.join(cache_dir, f"{c}.npy"))
+                                 for c in RATING_DTYPES})
+
+    record_cache("ratings_npy", misses=1)
+    ratings = _read_ratings_csv(ids)
+    # Each process writes its own temp dir; when several fill the same
+    # entry at once, the first rename wins and the others drop their copy
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=CACHE_DIR, prefix=f"{os.path.basename(cache_dir)}.tmp-")
+    try:
+        for c in RATING_DTYPES:
+            np.save(os.path.join(tmp_dir, f"{c}.npy"), ratings[c].to_numpy())
+        os.rename(tmp_dir, cache_dir)
+    except OSError:
+        if not os.path.isdir(cache_dir):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return ratings
+
+
+def read_rating_updates(offset: int = 0) -> Tuple[pd.DataFrame, int]:
+    """
+    Read the rating update journal (same columns as ratings.csv, no header)
+    starting at byte `offset`.
+
+    Returns:
+        Tuple[pd.DataFrame, int]: The updates in arrival order and the byte offset just past them.
+    """
+    empty = pd.DataFrame({c: np.empty(0, dtype=t) for c, t in RATING_DTYPES.items()})
+    try:
+        with open(RATING_UPDATES_CSV, 'rb') as f:
+            f.seek(offset)
+            raw = f.read()
+    except FileNotFoundError:
+        return empty, offset
+    # Ignore a trailing line that is still being written
+    complete = raw[:raw.rfind(b'\n') + 1]
+    if not complete:
+        return empty, offset
+    # Ids are parsed wide so an out-of-range line is dropped, not wrapped
+    updates = pd.read_csv(io.BytesIO(complete), header=None, usecols=[0, 1, 2],
+                          names=list(RATING_DTYPES),
+                          dtype={'userId': np.int64, 'movieId': np.int64, 'rating': np.float32})
+    bounds = np.iinfo(np.int32)
+    valid = updates['userId'].between(bounds.min, bounds.max) & updates['movieId'].between(bounds.min, bounds.max)
+    if not valid.all():
+        logger.warning("Skipping %d rating updates with out-of-range ids", int((~valid).sum()))
+    return updates[valid].astype(RATING_DTYPES).reset_index(drop=True), offset + len(complete)
+
+
+def apply_rating_updates(ratings: pd.DataFrame, updates: pd.DataFrame) -> pd.DataFrame:
+    """
+    Overlay journaled updates on the base ratings: the latest rating of a
+    user for a movie wins. Base duplicates keep their first row as before.
+    """
+    if updates.empty:
+        return ratings
+    ratings = ratings.drop_duplicates(['userId', 'movieId'])
+    combined = pd.concat([ratings, updates[ratings.columns]], ignore_index=True)
+    return combined.drop_duplicates(['userId', 'movieId'], keep='last')
 
 
 def load_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Load and return the movies and ratings dataframes.
 
+    Ratings are filtered on read to the movies that survive preprocessing,
+    which is all the model ever uses.
+
     Returns:
         Tuple[pd.DataFrame, pd.DataFrame]: A tuple containing the movies and ratings dataframes.
     """
-    movies = pd.read_csv('./data/movies_metadata.csv', low_memory=False)
-    ratings = pd.read_csv('./data/ratings.csv')
+    movies = load_movies()
+    retained_ids = preprocess_movies(movies)['MOVIE_ID']
+    ratings = load_ratings(retained_ids.astype(np.int64))
 
     return movies, ratings
 
 
-def preprocess_data(movies: pd.DataFrame, ratings: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def preprocess_movies(movies: pd.DataFrame) -> pd.DataFrame:
     """
-    Preprocesses the movies and ratings dataframes.
+    Selects English movies with more than 999 votes.
 
     Args:
         movies (pd.DataFrame): The movies dataframe.
-        ratings (pd.DataFrame): The ratings dataframe.
 
     Returns:
-        Tuple[pd.DataFrame, pd.DataFrame]: A tuple containing the preprocessed movies and ratings dataframes.
+        pd.DataFrame: MOVIE_ID, TITLE, LANGUAGE and VOTE_COUNT of the retained movies.
     """
     movies = movies[['id', 'original_title',
                      'original_language', 'vote_count']]
     movies = movies.rename(columns={'id': 'MOVIE_ID', 'original_title': 'TITLE',
                            'original_language': 'LANGUAGE', 'vote_count': 'VOTE_COUNT'})
 
+    movies['MOVIE_ID'] = pd.to_numeric(movies['MOVIE_ID'], errors='coerce')
+
+    movies.dropna(inplace=True)
+    return movies[(movies['LANGUAGE'] == 'en') & (
+        movies['VOTE_COUNT'] > 999)]
+
+
+@span("preprocess_data")
+def preprocess_data(movies: pd.DataFrame, ratings: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Preprocesses the movies and ratings dataframes.
+
+    Args:
+        movies (pd.DataFrame): The movies dataframe.
+        ratings (pd.DataFrame): The ratings dataframe.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: A tuple containing the preprocessed movies and ratings dataframes.
+    """
+    movies_processed = preprocess_movies(movies)
+
     ratings = ratings[['userId', 'movieId', 'rating']]
     ratings = ratings.rename(
         columns={'userId': 'USER_ID', 'movieId': 'MOVIE_ID', 'rating': 'RATING'})
 
-    movies['MOVIE_ID'] = pd.to_numeric(movies['MOVIE_ID'], errors='coerce')
     ratings['MOVIE_ID'] = pd.to_numeric(ratings['MOVIE_ID'], errors='coerce')
 
-    movies.dropna(inplace=True)
-    movies_processed = movies[(movies['LANGUAGE'] == 'en') & (
-        movies['VOTE_COUNT'] > 999)]
-
     ratings_processed = ratings
 
     return movies_processed, ratings_processed
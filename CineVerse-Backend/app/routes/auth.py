@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from app.schemas.user import UserCreate, UserLogin, UserResponse, ErrorResponse, UserBase, UserUpdateFavorites
 from app.services import data_service
 from app.services.auth_utils import verify_password
+from app.services.executors import users_pool
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -11,7 +12,7 @@ async def login(user_credentials: UserLogin):
     """
     Authenticates a user.
     """
-    db_user = data_service.get_user_by_email(user_credentials.email)
+    db_user = await users_pool.run(data_service.get_user_by_email, user_credentials.email)
     if not db_user or not verify_password(user_credentials.password, db_user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -31,15 +32,15 @@ async def signup(user: UserCreate):
     """
     Creates a new user.
     """
-    db_user = data_service.get_user_by_email(user.email)
+    db_user = await users_pool.run(data_service.get_user_by_email, user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
     try:
-        new_user = data_service.create_user(
-            name=user.name, email=user.email, password=user.password)
+        new_user = await users_pool.run(
+            data_service.create_user, name=user.name, email=user.email, password=user.password)
         user_data = UserBase(
             id=new_user.id,
             email=new_user.email,
@@ -59,8 +60,8 @@ async def update_favorites(user_id: str, favorites_data: UserUpdateFavorites):
     """
     Updates a user's list of favorite movie IDs.
     """
-    updated_user = data_service.update_user_favorites(
-        user_id, favorites_data.favorites)
+    updated_user = await users_pool.run(
+        data_service.update_user_favorites, user_id, favorites_data.favorites)
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,37 +1,100 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, status
-from app.schemas.movie import MovieListResponse, MovieDetailResponse, ErrorResponse, MovieBase
+from fastapi import APIRouter, HTTPException, Header, Query, Depends, Response, status
+from typing import List, Optional, Tuple
+from app.schemas.movie import MovieListResponse, MoviePageResponse, MovieDetailResponse, ErrorResponse, MovieBase, RecommendationResponse, TitleCandidate, RatingBatch, RatingBatchResponse, UserRecommendation, UserRecommendationResponse, MovieBatchRequest, MovieBatchResponse, RecommendationBatchRequest, RecommendationBatchResponse, SeedRecommendations
 from app.services import data_service
-from app.preprocessing import load_data, preprocess_data
-from app.model import train_model
+from app.services import model_service
+from app.services.ai_search import AISearchError, ai_search_service
+from app.services.catalog import movie_catalog
+from app.services.executors import catalog_pool, recommend_pool
+from app.services.metrics import span
+from app.services.rating_updates import rating_ingestor
+from app.services.result_cache import result_cache
+from app.services.search_index import tokenize
+from app.services.serialization import dumps, json_response, movie_serializer
+from app.services.title_resolver import normalize_title
 from random import choice
 from fastapi import Body
-import os
-import ast
-from openai import OpenAI
+from fastapi.responses import StreamingResponse
+import base64
+import hashlib
+import json
+import numpy as np
 from fastapi import HTTPException
 from dotenv import load_dotenv
-from rapidfuzz import process, fuzz
-import re
-import json
-import pandas as pd
 
 router = APIRouter(prefix="/movies", tags=["Movies"])
 
+MOVIE_FIELDS = list(MovieBase.model_fields)
+LISTING_SORTS = {"", "rating", "-rating", "year", "-year"}
+# Lowest fuzzy score (0-100) at which a title counts as matched
+MATCH_THRESHOLD = 60
+NO_MATCH = "No similar movie found."
+
 load_dotenv()
-movies, ratings = load_data()
-movies_processed, ratings_processed = preprocess_data(movies, ratings)
-model, movies_pivot, movies_sparse = train_model(
-    movies_processed, ratings_processed)
 
 
-@router.get("", response_model=MovieListResponse)
-async def get_all_movies():
+def _encode_cursor(sort: str, offset: int) -> str:
+    raw = json.dumps({"s": sort, "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        sort, offset = state["s"], int(state["o"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if sort not in LISTING_SORTS or offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return sort, offset
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+@router.get("", response_model=MoviePageResponse)
+async def get_all_movies(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; overrides sort and offset"),
+    sort: str = Query("", pattern="^(-?(rating|year))?$", description="rating, year, -rating or -year"),
+    fields: Optional[str] = Query(None, description="Comma-separated MovieBase fields to return"),
+    if_none_match: Optional[str] = Header(None),
+):
     """
-    Retrieves a list of all movies.
+    Retrieves movies, a page at a time when `limit` is given. Without
+    parameters the whole catalog is returned in file order.
     """
-    movies = data_service.get_movies()
-    print(movies)
-    return MovieListResponse(data=[MovieBase(**m.__dict__) for m in movies])
+    if cursor:
+        sort, offset = _decode_cursor(cursor)
+    selected = MOVIE_FIELDS
+    if fields:
+        selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected if f not in MOVIE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Unknown fields: {', '.join(unknown)}")
+
+    movies, total, version = await catalog_pool.run(data_service.list_movies, sort, offset, limit)
+    # The representation only depends on the catalog version and the query
+    query = json.dumps([sort, offset, limit, selected], separators=(",", ":"))
+    etag = '"%s-%s"' % (version, hashlib.blake2b(query.encode(), digest_size=6).hexdigest())
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    end = offset + len(movies)
+    next_cursor = _encode_cursor(sort, end) if limit is not None and end < total else None
+    page = {"total": total, "next_cursor": next_cursor}
+    if selected == MOVIE_FIELDS:
+        return movie_serializer.list_response(movies, extra=page, headers=headers)
+    rows = (MovieBase(**m.as_dict()).model_dump(mode="json") for m in movies)
+    payload = {"success": True, "data": [{f: row[f] for f in selected} for row in rows], **page}
+    return json_response(dumps(payload), headers)
 
 
 @router.get("/{movie_id}", response_model=MovieDetailResponse, responses={404: {"model": ErrorResponse}})
@@ -39,22 +102,38 @@ async def get_movie_by_id(movie_id: str):
     """
     Retrieves details for a specific movie by its ID.
     """
-    movie = data_service.get_movie_by_id(movie_id)
+    movie = await catalog_pool.run(data_service.get_movie_by_id, movie_id)
     if not movie:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Movie not found",
         )
-    return MovieDetailResponse(data=MovieBase(**movie.__dict__))
+    return movie_serializer.detail_response(movie)
+
+
+@router.post("/batch", response_model=MovieBatchResponse)
+async def get_movies_batch(batch: MovieBatchRequest):
+    """
+    Retrieves up to 500 movies by id in one call, in request order. Ids that
+    are not in the catalog are listed in `missing`.
+    """
+    movies, missing = await catalog_pool.run(data_service.get_movies_by_ids, batch.ids)
+    return movie_serializer.list_response(movies, extra={"missing": missing})
 
 
 @router.get("/search/{query}", response_model=MovieListResponse)
-async def search_movies(query: str):
+async def search_movies(query: str, limit: int = Query(50, ge=1, le=100), offset: int = Query(0, ge=0)):
     """
-    Searches for movies matching the query string.
+    Searches movie titles and descriptions, best matches first.
     """
-    movies = data_service.search_movies(query)
-    return MovieListResponse(data=[MovieBase(**m.__dict__) for m in movies])
+    async def compute():
+        movies = await recommend_pool.run(data_service.search_movies, query, limit=limit, offset=offset)
+        return movie_serializer.list_body(movies)
+
+    # Only the tokens of the query affect the ranking
+    body = await result_cache.get_or_compute("search", movie_catalog.version,
+                                             (tokenize(query), limit, offset), compute)
+    return json_response(body)
 
 
 @router.get("/genre/{genre_name}", response_model=MovieListResponse)
@@ -62,8 +141,13 @@ async def get_movies_by_genre(genre_name: str):
     """
     Retrieves movies belonging to a specific genre.
     """
-    movies = data_service.get_movies_by_genre(genre_name)
-    return MovieListResponse(data=[MovieBase(**m.__dict__) for m in movies])
+    async def compute():
+        movies = await catalog_pool.run(data_service.get_movies_by_genre, genre_name)
+        return movie_serializer.list_body(movies)
+
+    body = await result_cache.get_or_compute("genre", movie_catalog.version,
+                                             (genre_name.casefold(),), compute)
+    return json_response(body)
 
 
 @router.get("/mood/{mood_name}", response_model=MovieListResponse)
@@ -71,74 +155,170 @@ async def get_movies_by_mood(mood_name: str):
     """
     Retrieves movies matching a specific mood.
     """
-    movies = data_service.get_movies_by_mood(mood_name)
-    return MovieListResponse(data=[MovieBase(**m.__dict__) for m in movies])
+    async def compute():
+        movies = await catalog_pool.run(data_service.get_movies_by_mood, mood_name)
+        return movie_serializer.list_body(movies)
+
+    body = await result_cache.get_or_compute("mood", movie_catalog.version,
+                                             (mood_name.casefold(),), compute)
+    return json_response(body)
 
 
 @router.get("/recommended/{user_id}", response_model=MovieListResponse)
-async def get_recommended_movies(user_id: str):
+async def get_recommended_movies(user_id: str, mood: Optional[str] = None):
     """
     Retrieves recommended movies for a user, optionally filtered by mood.
     """
-    user = data_service.get_user_by_id(user_id)
-    if not user:
-        pass
-
-    movies = data_service.get_recommended_movies(user_id)
-    return MovieListResponse(data=[MovieBase(**m.__dict__) for m in movies])
-
-
-@router.get("/ai/recommendations/{movie_name}", response_model=MovieListResponse)
-async def get_recommendations(movie_name: str):
-
-    # Fuzzy match movie_name to closest in movies_pivot
-    all_titles = list(movies_pivot.index)
-    match, score, _ = process.extractOne(
-        movie_name, all_titles, scorer=fuzz.ratio)
-    if score < 60:  # threshold for match, can be adjusted
-        raise HTTPException(status_code=404, detail="No similar movie found.")
-
-    # Get KNN recommendations for the matched movie
-    _, suggestions_id = model.kneighbors(
-        movies_pivot.loc[match].values.reshape(1, -1))
-    movie_list = list(movies_pivot.index[suggestions_id[0]])
-
-    # Prepare full metadata for each recommended movie
-    recommended_movies = []
-    for rec_title in movie_list:
-        # Find movie row in movies (original DataFrame)
-        movie_row = movies[movies['original_title'] == rec_title]
-        if movie_row.empty:
-            continue
-        row = movie_row.iloc[0]
-        # Some fields may need conversion/handling if missing
-        try:
-            release_year = int(str(row['release_date'])[:4]) if pd.notnull(
-                row['release_date']) else 0
-        except Exception:
-            release_year = 0
-        # Genres parsing (assume genres is a stringified list of dicts)
-        genres = []
-        try:
-            genres_list = ast.literal_eval(
-                row['genres']) if pd.notnull(row['genres']) else []
-            genres = [g['name'] for g in genres_list if 'name' in g]
-        except Exception:
-            genres = []
-        movie_data = {
-            'id': str(row['id']),
-            'title': row['original_title'],
-            'description': row['overview'] if pd.notnull(row['overview']) else '',
-            'releaseYear': release_year,
-            'duration': str(row['runtime']) if 'runtime' in row and pd.notnull(row['runtime']) else '',
-            'rating': float(row['vote_average']) if 'vote_average' in row and pd.notnull(row['vote_average']) else 0.0,
-            'genres': genres,
-            'moods': [],
-            'poster_path': row['poster_path'] if pd.notnull(row['poster_path']) and 'http' in row['poster_path'] else '',
-        }
-        recommended_movies.append(MovieBase(**movie_data))
-
-    return MovieListResponse(data=recommended_movies)
+    movies = await recommend_pool.run(data_service.get_recommended_movies, user_id, mood=mood)
+    return movie_serializer.list_response(movies)
+
+
+def _suggestions(recommender, matches, rows) -> dict:
+    return dict(
+        data=[MovieBase(**record) for record in recommender.hydrate(rows)],
+        match=matches[0].title,
+        candidates=[TitleCandidate(title=m.title, score=m.score)
+                    for m in matches],
+    )
+
+
+def _recommend_similar(served: model_service.ServedModel, movie_name: str,
+                       candidates: int) -> RecommendationResponse:
+    recommender = served.model
+
+    # Fuzzy match movie_name to the closest titles in the model
+    with span("recommend.resolve_title"):
+        matches = served.title_resolver.resolve(movie_name, limit=candidates)
+    if not matches or matches[0].score < MATCH_THRESHOLD:
+        raise HTTPException(status_code=404, detail=NO_MATCH)
+
+    # Look up the most similar titles for the matched movie
+    with span("recommend.neighbors"):
+        suggestions_id = recommender.similar(matches[0].row)
+    with span("recommend.hydrate"):
+        return RecommendationResponse(**_suggestions(recommender, matches, suggestions_id))
+
+
+def _recommend_similar_batch(served: model_service.ServedModel, titles: List[str],
+                             candidates: int, merge: bool) -> RecommendationBatchResponse:
+    recommender = served.model
+    with span("recommend.resolve_title"):
+        matches = [served.title_resolver.resolve(title, limit=candidates) for title in titles]
+    found = [i for i, m in enumerate(matches) if m and m[0].score >= MATCH_THRESHOLD]
+
+    # One neighbor lookup for all matched seeds
+    with span("recommend.neighbors"):
+        suggestions = recommender.similar_many([matches[i][0].row for i in found])
+    results = [SeedRecommendations(query=title, success=False, data=[], error=NO_MATCH)
+               for title in titles]
+    merged = None
+    with span("recommend.hydrate"):
+        for i, rows in zip(found, suggestions):
+            results[i] = SeedRecommendations(query=titles[i], **_suggestions(recommender, matches[i], rows))
+        if merge:
+            # Round-robin over the seeds' lists, best first, each title once
+            seen = {int(rows[0]) for rows in suggestions}
+            merged_rows = []
+            for rank in range(1, max((len(rows) for rows in suggestions), default=0)):
+                for rows in suggestions:
+                    if rank < len(rows) and int(rows[rank]) not in seen:
+                        seen.add(int(rows[rank]))
+                        merged_rows.append(int(rows[rank]))
+            merged = [MovieBase(**record) for record in recommender.hydrate(np.array(merged_rows, dtype=np.int64))]
+    return RecommendationBatchResponse(results=results, merged=merged)
+
+
+@router.get("/ai/recommendations/{movie_name}", response_model=RecommendationResponse)
+async def get_recommendations(movie_name: str, candidates: int = Query(5, ge=1, le=20)):
+    # Without a background loader the first call loads the model: off the loop
+    served = model_service.current_model() or await recommend_pool.run(model_service.get_served_model)
+
+    async def compute():
+        response = await recommend_pool.run(_recommend_similar, served, movie_name, candidates)
+        return dumps(response.model_dump(mode="json"))
+
+    # Titles are resolved by their normalized form, so it determines the result
+    body = await result_cache.get_or_compute("recommendations", served.model.version,
+                                             (normalize_title(movie_name), candidates), compute)
+    return json_response(body)
+
+
+def _recommend_for_user(served: model_service.ServedModel, user_id: int,
+                        limit: int) -> UserRecommendationResponse:
+    recommender = served.model
+    col = recommender.user_column(user_id)
+    if col < 0:
+        raise HTTPException(status_code=404, detail="User not found in the rating data.")
+    try:
+        with span("recommend.user"):
+            picks = recommender.recommend_for_user(col, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    records, titles = recommender.records, recommender.titles
+    return UserRecommendationResponse(
+        user_id=user_id,
+        data=[UserRecommendation(movie=MovieBase(**records[row]), score=score,
+                                 because=str(titles[reason]))
+              for row, score, reason in picks if records[row] is not None],
+    )
+
+
+@router.get("/ai/users/{user_id}/recommendations", response_model=UserRecommendationResponse,
+            responses={404: {"model": ErrorResponse}})
+async def get_user_recommendations(user_id: int, limit: int = Query(10, ge=1, le=100)):
+    """
+    Titles a MovieLens user has not rated yet, each with the rated title it
+    is based on ("because you rated ..."). Needs a model built with the
+    table or svd engine.
+    """
+    served = model_service.current_model() or await recommend_pool.run(model_service.get_served_model)
+
+    async def compute():
+        response = await recommend_pool.run(_recommend_for_user, served, user_id, limit)
+        return dumps(response.model_dump(mode="json"))
+
+    body = await result_cache.get_or_compute("user_recommendations", served.model.version,
+                                             (user_id, limit), compute)
+    return json_response(body)
+
+
+@router.post("/ai/recommendations/batch", response_model=RecommendationBatchResponse)
+async def get_recommendations_batch(batch: RecommendationBatchRequest):
+    """
+    Similar titles for up to 50 seed titles in one call, one result per seed
+    in request order; seeds without a match carry an `error`. With
+    `merge=true`, `merged` lists the suggestions of all seeds once each,
+    without the seeds themselves.
+    """
+    served = model_service.current_model() or await recommend_pool.run(model_service.get_served_model)
+
+    async def compute():
+        response = await recommend_pool.run(_recommend_similar_batch, served, batch.titles,
+                                            batch.candidates, batch.merge)
+        return dumps(response.model_dump(mode="json"))
+
+    body = await result_cache.get_or_compute("recommendations_batch", served.model.version,
+                                             (batch.titles, batch.candidates, batch.merge), compute)
+    return json_response(body)
+
+
+@router.post("/ai/ratings", response_model=RatingBatchResponse, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_ratings(batch: RatingBatch, merge: bool = Query(False)):
+    """
+    Accepts a batch of MovieLens-style rating events. They are folded into
+    the recommendation model in the background, or right away with ?merge=true.
+    Events for movies the model does not know are rejected.
+    """
+    accepted, rejected = await recommend_pool.run(
+        rating_ingestor.submit, [(e.user_id, e.movie_id, e.rating) for e in batch.events])
+    if merge:
+        await recommend_pool.run(rating_ingestor.merge)
+    return RatingBatchResponse(
+        accepted=accepted,
+        rejected=rejected,
+        pending=rating_ingestor.pending,
+        model_version=model_service.get_served_model().model.version,
+    )
 
 
 @router.post("/ai-search", response_model=MovieListResponse)
@@ -146,65 +326,62 @@ async def ai_search(prompt: str = Body(..., embed=True)):
     """
     Accepts a user prompt and returns a list of movies generated by OpenRouter.
     """
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
-        raise HTTPException(
-            status_code=500, detail="OpenRouter API key not set in environment variable OPENROUTER_API_KEY.")
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key,
-    )
-
-    system_message = (
-        "You are a helpful movie recommendation assistant. "
-        "Given a user's prompt, return a JSON array of up to 10 movies, each with the following fields: "
-        "id (string), title (string), description (string), releaseYear (number), duration (string), rating (number), "
-        "genres (array of strings), moods (array of strings). "
-        "Do not include any explanation, only the JSON array."
-    )
-    user_message = f"User prompt: {prompt}"
     try:
-        response = client.chat.completions.create(
-            model="deepseek/deepseek-prover-v2:free",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=1200,
-            temperature=0.7,
-        )
-        # Defensive check for response structure
-        if not hasattr(response, "choices") or not response.choices or not hasattr(response.choices[0], "message") or not hasattr(response.choices[0].message, "content"):
-            raise HTTPException(
-                status_code=500,
-                detail=f"OpenRouter API returned unexpected response: {response}"
-            )
-        content = response.choices[0].message.content
-        if content is None:
-            raise HTTPException(
-                status_code=500,
-                detail=f"OpenRouter API returned a response with no content: {response}"
-            )
-        content = content.strip()
-        # Attempt to extract JSON array from the response
+        records = await ai_search_service.search(prompt)
+    except AISearchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    # Validate and convert to MovieBase
+    movie_objs = []
+    for record in records:
         try:
-            code_block_match = re.search(
-                r"```(?:json)?\s*([\s\S]+?)\s*```", content)
-            if code_block_match:
-                content = code_block_match.group(1)
-            movies_list = json.loads(content)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500, detail=f"Failed to parse OpenRouter response as JSON: {str(e)}. Response was: {content}")
-        # Validate and convert to MovieBase
-        movie_objs = []
-        for m in movies_list:
+            movie_objs.append(MovieBase(**record))
+        except Exception:
+            continue  # Skip invalid items
+    return MovieListResponse(data=movie_objs)
+
+
+@router.post("/ai-search/stream")
+async def ai_search_stream(prompt: str = Body(..., embed=True),
+                           format: str = Query("ndjson", pattern="^(ndjson|sse)$")):
+    """
+    Streams the movies of /ai-search one at a time, as soon as the LLM has
+    generated each of them. `format=ndjson` sends one MovieBase JSON object
+    per line; `format=sse` sends `movie` events followed by a `done` event.
+    The response starts with the first movie, so a failure before it (missing
+    key, timeout, upstream error) is an HTTP error like on /ai-search; a
+    failure after it is reported as an `error` line/event.
+    """
+    async def valid_movies():
+        async for record in ai_search_service.stream(prompt):
             try:
-                movie_objs.append(MovieBase(**m))
+                yield MovieBase(**record)
             except Exception:
                 continue  # Skip invalid items
-        return MovieListResponse(data=movie_objs)
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"OpenRouter API error: {str(e)}")
+    movies = valid_movies()
+    try:
+        first = await anext(movies, None)
+    except AISearchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    def encode(event: str, payload: str) -> str:
+        if format == "sse":
+            return f"event: {event}\ndata: {payload}\n\n"
+        return f"{payload}\n" if event == "movie" else ""
+
+    async def body():
+        if first is not None:
+            yield encode("movie", first.model_dump_json())
+            try:
+                async for movie in movies:
+                    yield encode("movie", movie.model_dump_json())
+            except AISearchError as e:
+                error = json.dumps({"error": e.detail})
+                yield encode("error", error) if format == "sse" else f"{error}\n"
+                return
+        yield encode("done", "{}")
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type,
+                             headers={"Cache-Control": "no-cache"})
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 
@@ -19,11 +19,100 @@ class MovieListResponse(BaseModel):
     data: List[MovieBase]
 
 
+class MovieFields(BaseModel):
+    # MovieBase fields; with `fields=` an item only carries the requested ones
+    id: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    releaseYear: Optional[int] = None
+    duration: Optional[str] = None
+    rating: Optional[float] = None
+    genres: Optional[List[str]] = None
+    moods: Optional[List[str]] = None
+    poster_path: Optional[str] = None
+
+
+class MoviePageResponse(BaseModel):
+    success: bool = True
+    data: List[MovieFields]
+    total: int
+    next_cursor: Optional[str] = None
+
+
 class MovieDetailResponse(BaseModel):
     success: bool = True
     data: MovieBase
 
 
+class TitleCandidate(BaseModel):
+    title: str
+    score: float
+
+
+class RecommendationResponse(MovieListResponse):
+    match: Optional[str] = None
+    candidates: List[TitleCandidate] = []
+
+
+class MovieBatchRequest(BaseModel):
+    ids: List[str] = Field(max_length=500)
+
+
+class MovieBatchResponse(MovieListResponse):
+    # Requested ids that are not in the catalog
+    missing: List[str] = []
+
+
+class RecommendationBatchRequest(BaseModel):
+    titles: List[str] = Field(min_length=1, max_length=50)
+    candidates: int = Field(5, ge=1, le=20)
+    # Also return one list of all suggestions, deduplicated, without the seeds
+    merge: bool = False
+
+
+class SeedRecommendations(RecommendationResponse):
+    query: str
+    error: Optional[str] = None
+
+
+class RecommendationBatchResponse(BaseModel):
+    success: bool = True
+    results: List[SeedRecommendations]
+    merged: Optional[List[MovieBase]] = None
+
+
+class UserRecommendation(BaseModel):
+    movie: MovieBase
+    score: float
+    # Title the user rated that this recommendation is based on
+    because: Optional[str] = None
+
+
+class UserRecommendationResponse(BaseModel):
+    success: bool = True
+    user_id: int
+    data: List[UserRecommendation]
+
+
+class RatingEvent(BaseModel):
+    # User and movie ids are stored as int32
+    user_id: int = Field(ge=1, le=2**31 - 1)
+    movie_id: int = Field(ge=1, le=2**31 - 1)
+    rating: float = Field(ge=0.5, le=5.0)
+
+
+class RatingBatch(BaseModel):
+    events: List[RatingEvent]
+
+
+class RatingBatchResponse(BaseModel):
+    success: bool = True
+    accepted: int
+    rejected: int
+    pending: int
+    model_version: str
+
+
 class ErrorResponse(BaseModel):
     success: bool = False
     error: str
@@ -0,0 +1,239 @@
+"""
+Pre-forking API server.
+
+    python -m app.serve [--host 0.0.0.0] [--port 5000] [--workers 4] [--no-preload]
+
+The master process imports the app once (loading the model, the catalog and
+the search and title indexes), moves every object it created out of the
+garbage collector's reach with gc.freeze() and then forks the workers, which
+inherit all of it copy-on-write. The bulky data lives in numpy buffers and
+memory-mapped artifacts, which reference counting never writes to, and
+frozen objects are never touched by the collector, so the pages stay shared.
+
+The master restarts workers that die and logs the combined RSS and PSS
+(proportional set size: shared pages split between the processes that map
+them) of the workers at startup and every --memory-report-interval seconds.
+Run with --no-preload to let every worker load its own copy for comparison.
+
+On SIGTERM or SIGINT the master asks every worker to stop; a worker stops
+accepting connections, finishes its in-flight requests (for up to
+--graceful-timeout seconds) and exits normally, which flushes buffered
+favorites through the atexit hooks.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger("cineverse.serve")
+
+# Fields of /proc/<pid>/smaps_rollup, in kB
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def preload():
+    """
+    Imports the app and builds everything that is otherwise created lazily on
+    the first request, so forked workers share it instead of each building
+    their own.
+    """
+    from app.main import app, load_recommender
+    from app.services.ai_search import ai_search_service
+    from app.services.catalog import movie_catalog
+    from app.services.personalization import personal_recommender
+    from app.services.search_index import movie_search_index
+    from app.services.serialization import movie_serializer
+
+    # Loaded here, the workers' lifespan finds the model ready and skips loading
+    load_recommender()
+    movie_serializer.array(movie_catalog.snapshot().movies)
+    movie_search_index.search("")
+    personal_recommender.features()
+    ai_search_service._current_matcher()
+    return app
+
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """
+    Memory of one process in kB. Without smaps_rollup (Linux < 4.14) only
+    the RSS is known and PSS is reported equal to it.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            memory = {}
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in SMAPS_FIELDS:
+                    memory[name] = int(rest.split()[0])
+            return memory
+    except FileNotFoundError:
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+        return {"Rss": rss, "Pss": rss}
+
+
+def memory_report(pids: Iterable[int]) -> Dict[str, float]:
+    """
+    Combined memory of `pids` in MiB. `rss_mb` counts shared pages once per
+    process, `pss_mb` once overall; their difference is what sharing saves.
+    """
+    totals = dict.fromkeys(SMAPS_FIELDS, 0)
+    processes = 0
+    for pid in pids:
+        try:
+            memory = process_memory(pid)
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        processes += 1
+        for name, value in memory.items():
+            totals[name] += value
+    return {
+        "processes": processes,
+        "rss_mb": totals["Rss"] / 1024,
+        "pss_mb": totals["Pss"] / 1024,
+        "shared_mb": (totals["Shared_Clean"] + totals["Shared_Dirty"]) / 1024,
+        "private_mb": (totals["Private_Clean"] + totals["Private_Dirty"]) / 1024,
+    }
+
+
+class PreforkServer:
+    def __init__(self, host: str, port: int, workers: int, preload_app: bool = True,
+                 memory_report_interval: float = 60.0, log_level: str = "info",
+                 graceful_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload_app = preload_app
+        self.memory_report_interval = memory_report_interval
+        self.log_level = log_level
+        self.graceful_timeout = graceful_timeout
+        self.app = None
+        self._socket = None
+        self._children: List[int] = []
+        self._stopping = False
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid:
+            return pid
+        # Worker: never returns into the master's loop. A stop signal that
+        # arrives while the app is still loading only sets _stopping (the
+        # master's handler, inherited), which _serve checks
+        self._stopping = False
+        status = 1
+        try:
+            self._serve()
+            status = 0
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+        # A normal interpreter exit runs the atexit hooks (favorites flush)
+        sys.exit(status)
+
+    def _serve(self):
+        import uvicorn
+        app = self.app
+        if app is None:
+            from app.main import app
+        config = uvicorn.Config(app, log_level=self.log_level,
+                                timeout_graceful_shutdown=self.graceful_timeout)
+        server = uvicorn.Server(config)
+
+        def stop(signum, frame):
+            server.should_exit = True
+
+        # uvicorn handles these itself while serving and restores (then
+        # re-raises to) this handler afterwards, so the worker still exits
+        # through the interpreter rather than being killed by the default action
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        if self._stopping:
+            return
+        server.run(sockets=[self._socket])
+
+    def _report_memory(self):
+        report = memory_report(self._children)
+        logger.info("%d workers: RSS %.1f MiB summed, PSS %.1f MiB (shared %.1f MiB, private %.1f MiB)",
+                    report["processes"], report["rss_mb"], report["pss_mb"],
+                    report["shared_mb"], report["private_mb"])
+        return report
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        self._socket = self._bind()
+        if self.preload_app:
+            started = time.perf_counter()
+            self.app = preload()
+            # Everything loaded so far lives as long as the process: keep the
+            # collector from writing to those objects in the workers
+            gc.collect()
+            gc.freeze()
+            logger.info("Preloaded the app in %.1fs", time.perf_counter() - started)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        self._children = [self._spawn() for _ in range(self.workers)]
+        logger.info("Serving on http://%s:%d with %d workers (preload %s)",
+                    self.host, self.port, self.workers, "on" if self.preload_app else "off")
+
+        # Give the workers time to start (and load, without preload) before the first report
+        next_report = time.monotonic() + (5 if self.preload_app else 30)
+        while not self._stopping:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid and pid in self._children:
+                logger.warning("Worker %d exited with status %d, restarting", pid, os.waitstatus_to_exitcode(status))
+                self._children[self._children.index(pid)] = self._spawn()
+                continue
+            if self.memory_report_interval >= 0 and time.monotonic() >= next_report:
+                self._report_memory()
+                next_report = (time.monotonic() + self.memory_report_interval
+                               if self.memory_report_interval > 0 else float("inf"))
+            time.sleep(0.5)
+
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in self._children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self._socket.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked workers sharing one model.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="load the app in every worker instead of once in the master")
+    parser.add_argument("--memory-report-interval", type=float, default=60.0,
+                        help="seconds between worker memory reports; 0 reports once, -1 never (default: %(default)s)")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="seconds a stopping worker waits for in-flight requests (default: %(default)s)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(message)s")
+    PreforkServer(args.host, args.port, args.workers, preload_app=args.preload,
+                  memory_report_interval=args.memory_report_interval,
+                  log_level=args.log_level, graceful_timeout=args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from app.services.catalog import CatalogSnapshot, MovieCatalog, movie_catalog
+from app.services.metrics import STAGE_SECONDS, record_cache, span
+from app.services.title_resolver import normalize_title
+
+# The openai package is slow to import; it is loaded with the first client
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+load_dotenv()
+
+# The endpoint and model can be pointed at any OpenAI-compatible server,
+# e.g. a local stub for testing
+BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+MODEL = os.getenv("OPENROUTER_MODEL", "deepseek/deepseek-prover-v2:free")
+MAX_CONCURRENCY = int(os.getenv("CINEVERSE_AI_CONCURRENCY", "8"))
+TIMEOUT = float(os.getenv("CINEVERSE_AI_TIMEOUT", "30"))
+CACHE_TTL = float(os.getenv("CINEVERSE_AI_CACHE_TTL", "600"))
+CACHE_SIZE = 1024
+# Drop suggested movies that are not in the local catalog instead of
+# returning them as the LLM described them
+CATALOG_ONLY = os.getenv("CINEVERSE_AI_CATALOG_ONLY", "0") == "1"
+
+SYSTEM_MESSAGE = (
+    "You are a helpful movie recommendation assistant. "
+    "Given a user's prompt, return a JSON array of up to 10 movies, each with the following fields: "
+    "id (string), title (string), description (string), releaseYear (number), duration (string), rating (number), "
+    "genres (array of strings), moods (array of strings). "
+    "Do not include any explanation, only the JSON array."
+)
+CODE_BLOCK_RE = re.compile(r"```(?:json)?\s*([\s\S]+?)\s*```")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+class AISearchError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def normalize_prompt(prompt: str) -> str:
+    return WHITESPACE_RE.sub(" ", prompt).strip().casefold()
+
+
+def parse_movie_list(content: Optional[str]) -> List[dict]:
+    """
+    Extracts the JSON array of movies from a completion, with or without a
+    surrounding code fence.
+    """
+    if content is None:
+        raise AISearchError(502, "OpenRouter API returned a response with no content")
+    content = content.strip()
+    block = CODE_BLOCK_RE.search(content)
+    if block:
+        content = block.group(1)
+    try:
+        movies = json.loads(content)
+    except ValueError as e:
+        raise AISearchError(
+            502, f"Failed to parse OpenRouter response as JSON: {e}. Response was: {content}")
+    if not isinstance(movies, list):
+        raise AISearchError(502, f"OpenRouter response is not a JSON array: {content}")
+    return [m for m in movies if isinstance(m, dict)]
+
+
+class JSONArrayStream:
+    """
+    Incrementally extracts the objects of a JSON array from text that arrives
+    in arbitrary pieces, e.g. an LLM token stream.
+
+    Anything before the opening bracket (such as a code fence) is skipped.
+    Each top-level object is decoded as soon as its closing brace arrives;
+    objects that do not decode are dropped, and an object left open when the
+    stream ends is ignored.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self._current: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[dict]:
+        objects = []
+        for ch in text:
+            if self.done:
+                break
+            if not self.started:
+                self.started = ch == '['
+                continue
+            if self._depth == 0:
+                # Between objects only an opening brace or the closing bracket matter
+                if ch == '{':
+                    self._depth = 1
+                    self._current = [ch]
+                elif ch == ']':
+                    self.done = True
+                continue
+            self._current.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        value = json.loads(''.join(self._current))
+                    except ValueError:
+                        value = None
+                    if isinstance(value, dict):
+                        objects.append(value)
+        return objects
+
+
+class CatalogMatcher:
+    """
+    Looks suggested movies up in one catalog snapshot by normalized title,
+    preferring the entry with the same release year.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.version = snapshot.version
+        self._by_title: Dict[str, list] = {}
+        for movie in snapshot.by_id.values():
+            self._by_title.setdefault(normalize_title(movie.title), []).append(movie)
+
+    def match(self, suggestion: dict):
+        movies = self._by_title.get(normalize_title(suggestion.get("title", "")))
+        if not movies:
+            return None
+        for movie in movies:
+            if movie.releaseYear == suggestion.get("releaseYear"):
+                return movie
+        return movies[0]
+
+
+class AISearchService:
+    """
+    Movie suggestions from an LLM for a free-text prompt.
+
+    One AsyncOpenAI client (and its connection pool) is shared by all
+    requests, at most MAX_CONCURRENCY completions run at once, and every call
+    is bounded by TIMEOUT. Identical prompts in flight share one completion
+    and answers are cached for CACHE_TTL seconds by normalized prompt.
+    Suggestions are matched against the catalog so callers get real catalog
+    ids and metadata.
+    """
+
+    def __init__(self, catalog: MovieCatalog, api_key: Optional[str] = None,
+                 base_url: str = BASE_URL, model: str = MODEL):
+        self.catalog = catalog
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self._client: Optional["AsyncOpenAI"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._cache: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self._matcher: Optional[CatalogMatcher] = None
+
+    def _ensure_client(self) -> "AsyncOpenAI":
+        from openai import AsyncOpenAI
+
+        api_key = self.api_key or os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            raise AISearchError(
+                500, "OpenRouter API key not set in environment variable OPENROUTER_API_KEY.")
+        loop = asyncio.get_running_loop()
+        # Connections and the semaphore belong to one event loop
+        if self._client is None or self._loop is not loop:
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=api_key,
+                                       timeout=TIMEOUT, max_retries=1)
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+            self._inflight = {}
+            self._loop = loop
+        return self._client
+
+    def _cached(self, key: str) -> Optional[List[dict]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            record_cache("ai_search", misses=1)
+            return None
+        expires, suggestions = entry
+        if expires < time.monotonic():
+            del self._cache[key]
+            record_cache("ai_search", misses=1)
+            return None
+        self._cache.move_to_end(key)
+        record_cache("ai_search", hits=1)
+        return suggestions
+
+    def _store(self, key: str, suggestions: List[dict]):
+        self._cache[key] = (time.monotonic() + CACHE_TTL, suggestions)
+        self._cache.move_to_end(key)
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _complete(self, client: "AsyncOpenAI", prompt: str) -> List[dict]:
+        from openai import APITimeoutError, OpenAIError
+
+        try:
+            async with self._semaphore:
+                with span("ai_search.completion"):
+                    response = await asyncio.wait_for(client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": SYSTEM_MESSAGE},
+                            {"role": "user", "content": f"User prompt: {prompt}"},
+                        ],
+                        max_tokens=1200,
+                        temperature=0.7,
+                    ), TIMEOUT)
+        except (asyncio.TimeoutError, APITimeoutError):
+            raise AISearchError(504, "OpenRouter API timed out")
+        except OpenAIError as e:
+            raise AISearchError(502, f"OpenRouter API error: {e}")
+        if not response.choices or response.choices[0].message is None:
+            raise AISearchError(502, f"OpenRouter API returned unexpected response: {response}")
+        return parse_movie_list(response.choices[0].message.content)
+
+    async def _suggest(self, prompt: str) -> List[dict]:
+        key = normalize_prompt(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        client = self._ensure_client()
+        task = self._inflight.get(key)
+        # A hit shares a completion another request already started
+        record_cache("ai_search_inflight", hits=task is not None, misses=task is None)
+        if task is None:
+            task = asyncio.ensure_future(self._complete(client, prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled request must not cancel the completion others wait on
+        suggestions = await asyncio.shield(task)
+        self._store(key, suggestions)
+        return suggestions
+
+    def _current_matcher(self) -> CatalogMatcher:
+        snapshot = self.catalog.snapshot()
+        matcher = self._matcher
+        if matcher is None or matcher.version != snapshot.version:
+            matcher = self._matcher = CatalogMatcher(snapshot)
+        return matcher
+
+    @staticmethod
+    def _record(matcher: CatalogMatcher, suggestion: dict, seen: Set[str]) -> Optional[dict]:
+        movie = matcher.match(suggestion)
+        if movie is None:
+            return None if CATALOG_ONLY else suggestion
+        if movie.id in seen:
+            return None
+        seen.add(movie.id)
+        return movie.as_dict()
+
+    def _validate(self, suggestions: List[dict]) -> List[dict]:
+        matcher, seen = self._current_matcher(), set()
+        records = (self._record(matcher, s, seen) for s in suggestions)
+        return [r for r in records if r is not None]
+
+    async def search(self, prompt: str) -> List[dict]:
+        """
+        Returns MovieBase-ready records for the movies the LLM suggests.
+
+        Raises:
+            AISearchError: With the HTTP status to report when the LLM call fails.
+        """
+        return self._validate(await self._suggest(prompt))
+
+    def stream(self, prompt: str) -> AsyncIterator[dict]:
+        """
+        Like `search`, but yields each record as soon as the LLM has finished
+        generating it. Cached prompts are replayed immediately.
+
+        Raises:
+            AISearchError: Right away when the client is not configured, or
+                while iterating when the LLM call fails.
+        """
+        key = normalize_prompt(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            return self._replay(cached)
+        return self._stream(self._ensure_client(), key, prompt)
+
+    async def _replay(self, suggestions: List[dict]) -> AsyncIterator[dict]:
+        for record in self._validate(suggestions):
+            yield record
+
+    async def _stream(self, client: "AsyncOpenAI", key: str, prompt: str) -> AsyncIterator[dict]:
+        from openai import APITimeoutError, OpenAIError
+
+        parser, suggestions, seen = JSONArrayStream(), [], set()
+        matcher = self._current_matcher()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + TIMEOUT
+        started = time.perf_counter()
+        try:
+            async with self._semaphore:
+                with span("ai_search.stream"):
+                    chunks = await asyncio.wait_for(client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": SYSTEM_MESSAGE},
+                            {"role": "user", "content": f"User prompt: {prompt}"},
+                        ],
+                        max_tokens=1200,
+                        temperature=0.7,
+                        stream=True,
+                    ), TIMEOUT)
+                    async with chunks:
+                        iterator = chunks.__aiter__()
+                        while not parser.done:
+                            try:
+                                chunk = await asyncio.wait_for(
+                                    iterator.__anext__(), max(deadline - loop.time(), 0))
+                            except StopAsyncIteration:
+                                break
+                            text = chunk.choices[0].delta.content if chunk.choices else None
+                            for suggestion in parser.feed(text or ""):
+                                suggestions.append(suggestion)
+                                record = self._record(matcher, suggestion, seen)
+                                if record is not None:
+                                    if started is not None:
+                                        STAGE_SECONDS.labels("ai_search.stream_first_movie").observe(
+                                            time.perf_counter() - started)
+                                        started = None
+                                    yield record
+        except (asyncio.TimeoutError, APITimeoutError):
+            raise AISearchError(504, "OpenRouter API timed out")
+        except OpenAIError as e:
+            raise AISearchError(502, f"OpenRouter API error: {e}")
+        if not parser.started:
+            raise AISearchError(502, "OpenRouter response did not contain a JSON array")
+        self._store(key, suggestions)
+
+
+ai_search_service = AISearchService(movie_catalog)
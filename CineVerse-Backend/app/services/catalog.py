@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from app.models.movie import Movie
+from app.config import MOVIES_FILE
+from app.services.metrics import registry, span
+
+# Sortable listing fields; prefix with "-" for descending order
+SORT_KEYS = {
+    "rating": lambda m: m.rating or 0.0,
+    "year": lambda m: m.releaseYear or 0,
+}
+
+
+class CatalogSnapshot:
+    """
+    An immutable, fully indexed view of the movies file at one point in time.
+
+    Readers grab a snapshot once and use it for the whole request, so a reload
+    running concurrently never exposes a half-built index.
+    """
+
+    def __init__(self, movies: List[Movie], version: str):
+        self.version = version
+        self.movies = movies
+        self.by_id: Dict[str, Movie] = {}
+        self.by_genre: Dict[str, List[Movie]] = {}
+        self.by_mood: Dict[str, List[Movie]] = {}
+
+        for movie in movies:
+            # Keep the first movie for a duplicated id, like the old linear scan did
+            self.by_id.setdefault(movie.id, movie)
+            for genre in {g.casefold() for g in movie.genres}:
+                self.by_genre.setdefault(genre, []).append(movie)
+            for mood in {m.casefold() for m in movie.moods}:
+                self.by_mood.setdefault(mood, []).append(movie)
+        # Every listing order, ascending and descending; ties keep file order
+        self._sorted: Dict[str, List[Movie]] = {"": movies}
+        for name, key in SORT_KEYS.items():
+            self._sorted[name] = sorted(movies, key=key)
+            self._sorted[f"-{name}"] = sorted(movies, key=lambda m, key=key: -key(m))
+
+    def sorted_by(self, sort: str) -> List[Movie]:
+        """
+        The movies ordered by one of SORT_KEYS, "-" prefixed for descending
+        ("" keeps file order).
+        """
+        return self._sorted[sort]
+
+
+class MovieCatalog:
+    """
+    Loads the movies file once and serves O(1) lookups from memory.
+
+    The file's mtime and size are checked on every access; when either changes
+    the catalog is rebuilt and `version` changes with it.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._snapshot = CatalogSnapshot([], version="")
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.file_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    @span("catalog.reload")
+    def _load(self, stamp: Optional[Tuple[int, int]]):
+        if stamp is None:
+            self._snapshot = CatalogSnapshot([], version="")
+            self._stamp = None
+            return
+        try:
+            with open(self.file_path, 'rb') as f:
+                raw = f.read()
+            movies_data = json.loads(raw)
+        except (OSError, json.JSONDecodeError):
+            # Most likely caught the file mid-write: keep serving the last good
+            # snapshot and try again on the next access.
+            return
+        version = hashlib.blake2b(raw, digest_size=8).hexdigest()
+        movies = [Movie(**movie_data) for movie_data in movies_data]
+        self._snapshot = CatalogSnapshot(movies, version)
+        self._stamp = stamp
+
+    def snapshot(self) -> CatalogSnapshot:
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._load(stamp)
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self.snapshot().version
+
+    def all(self) -> List[Movie]:
+        return list(self.snapshot().movies)
+
+    def get(self, movie_id: str) -> Optional[Movie]:
+        return self.snapshot().by_id.get(movie_id)
+
+    def by_genre(self, genre_name: str) -> List[Movie]:
+        return list(self.snapshot().by_genre.get(genre_name.casefold(), []))
+
+    def by_mood(self, mood_name: str) -> List[Movie]:
+        return list(self.snapshot().by_mood.get(mood_name.casefold(), []))
+
+
+movie_catalog = MovieCatalog(MOVIES_FILE)
+registry.gauge("cineverse_catalog_movies", "Movies in the loaded catalog snapshot.",
+               collect=lambda: {(): len(movie_catalog._snapshot.movies)})
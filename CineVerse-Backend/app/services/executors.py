@@ -0,0 +1,51 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class WorkPool:
+    """
+    A bounded thread pool for one class of endpoints.
+
+    Routes stay `async def` and hand every blocking call (SQLite, file
+    reloads, numpy/rapidfuzz work) to the pool of their class, so the event
+    loop keeps serving other requests. At most `workers` calls of a class run
+    at once; further calls queue up without blocking the loop.
+    The worker count comes from CINEVERSE_POOL_<NAME>.
+    """
+
+    def __init__(self, name: str, default_workers: int):
+        self.name = name
+        self.workers = int(os.getenv(f"CINEVERSE_POOL_{name.upper()}", default_workers))
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix=f"pool-{self.name}")
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(), functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Catalog lookups are cheap but may reload movies.json, user calls hit
+# SQLite, recommendation work is numpy/scipy/rapidfuzz compute
+catalog_pool = WorkPool("catalog", 8)
+users_pool = WorkPool("users", 4)
+recommend_pool = WorkPool("recommend", os.cpu_count() or 4)
@@ -0,0 +1,268 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app.config import FAVORITES_JOURNAL
+from app.models.user import User
+from app.services.user_store import UserStore, user_store
+
+logger = logging.getLogger(__name__)
+
+# Buffered favorites are written to the database every FLUSH_INTERVAL
+# seconds, or as soon as FLUSH_THRESHOLD users have pending changes
+FLUSH_INTERVAL = float(os.getenv("CINEVERSE_FAVORITES_FLUSH_INTERVAL", "0.5"))
+FLUSH_THRESHOLD = int(os.getenv("CINEVERSE_FAVORITES_FLUSH_THRESHOLD", "256"))
+
+
+class FavoritesBuffer:
+    """
+    Write-behind buffer for favorites updates.
+
+    An update is appended to a journal and acknowledged once the journal is
+    fsynced; concurrent updates share one fsync (group commit). The latest
+    favorites per user are kept in memory and applied to every read, and are
+    written to the user store in batches, one transaction per flush. Each
+    flush rotates the journal to a new segment; segments are deleted once
+    their batch is committed, and replayed into the store on startup if the
+    process died before that. Segment names carry the writer's pid, so
+    several worker processes can share one journal path; a process claims
+    an orphaned segment by renaming it before replaying it.
+
+    Every update is stamped with the time it was made and the store keeps
+    the stamp of the favorites it holds, so when workers flush out of order
+    an older full list never replaces a newer one.
+    """
+
+    def __init__(self, store: UserStore, journal_path: str,
+                 flush_interval: float = FLUSH_INTERVAL, flush_threshold: int = FLUSH_THRESHOLD):
+        self.store = store
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # user id -> (stamp, favorites)
+        self._pending: Dict[str, Tuple[int, List[str]]] = {}
+        self._flushing: Dict[str, Tuple[int, List[str]]] = {}
+        self._stamp = 0
+        self._journal = None
+        self._segment = 0
+        self._written = 0
+        self._synced = 0
+        self._recovered = False
+        self._thread = None
+
+    def _segments(self, pid: Optional[int] = None) -> List[str]:
+        owner = "*" if pid is None else str(pid)
+        return sorted(glob.glob(f"{glob.escape(self.journal_path)}.{owner}.*"))
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _orphaned(self) -> List[str]:
+        """
+        Segments left behind by processes that are gone, including an earlier
+        process that had this one's pid.
+        """
+        segments = []
+        for path in self._segments():
+            try:
+                pid = int(path.rsplit(".", 2)[1])
+            except ValueError:
+                continue
+            if pid == os.getpid() or not self._alive(pid):
+                segments.append(path)
+        return segments
+
+    def _claim(self, paths: List[str]) -> List[str]:
+        """
+        Renames orphaned segments to names carrying this process's pid, so
+        that of several processes recovering at once exactly one replays
+        each segment. Segments another process claimed first are skipped.
+        """
+        claimed = []
+        for path in paths:
+            _, owner, suffix = path.rsplit(".", 2)
+            if int(owner) == os.getpid():
+                claimed.append(path)
+                continue
+            target = f"{self.journal_path}.{os.getpid()}.r{owner}-{suffix}"
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+        return claimed
+
+    def _recover(self):
+        if self._recovered:
+            return
+        with self._flush_lock:
+            if self._recovered:
+                return
+            segments = self._claim(self._orphaned())
+            replay: Dict[str, Tuple[int, List[str]]] = {}
+            for path in segments:
+                try:
+                    f = open(path, 'rb')
+                except FileNotFoundError:
+                    continue  # replayed and removed by another buffer on this journal
+                with f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                            # Records written before stamps existed sort
+                            # before every stamped write
+                            stamp = entry.get("t", 1)
+                            if stamp >= replay.get(entry["u"], (0, None))[0]:
+                                replay[entry["u"]] = (stamp, entry["f"])
+                        except (ValueError, KeyError, TypeError, AttributeError):
+                            break  # torn write at the end of a segment
+            if replay:
+                self.store.set_favorites_many(replay)
+                logger.info("Recovered %d favorites updates from the journal", len(replay))
+            for path in segments:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._recovered = True
+
+    def _sync(self, seq: int):
+        """
+        Returns once journal record `seq` is on disk, fsyncing everything
+        written so far if no other thread has done so yet.
+        """
+        if self._synced >= seq:
+            return
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            with self._lock:
+                target, journal = self._written, self._journal
+            os.fsync(journal.fileno())
+            self._synced = max(self._synced, target)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="favorites-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing favorites failed")
+
+    def _overlay(self, user: Optional[User]) -> Optional[User]:
+        if user is not None:
+            with self._lock:
+                entry = self._pending.get(user.id, self._flushing.get(user.id))
+            if entry is not None:
+                user.favorites = list(entry[1])
+        return user
+
+    def get_by_id(self, user_id: str) -> Optional[User]:
+        self._recover()
+        return self._overlay(self.store.get_by_id(user_id))
+
+    def get_by_email(self, email: str) -> Optional[User]:
+        self._recover()
+        return self._overlay(self.store.get_by_email(email))
+
+    def all(self) -> List[User]:
+        self._recover()
+        return [self._overlay(user) for user in self.store.all()]
+
+    def update(self, user_id: str, favorites: List[str]) -> Optional[User]:
+        """
+        Records new favorites for a user. Returns the updated user, or None if
+        the user does not exist. The change is durable when this returns.
+        """
+        user = self.get_by_id(user_id)
+        if user is None:
+            return None
+        favorites = list(favorites)
+        with self._lock:
+            # Strictly increasing within the process even if the clock steps back
+            self._stamp = max(time.time_ns(), self._stamp + 1)
+            stamp = self._stamp
+            record = (json.dumps({"u": user_id, "f": favorites, "t": stamp}) + "\n").encode()
+            if self._journal is None:
+                self._segment += 1
+                self._journal = open(f"{self.journal_path}.{os.getpid()}.{self._segment:010d}", 'ab')
+            self._journal.write(record)
+            self._journal.flush()
+            self._written += 1
+            seq = self._written
+            self._pending[user_id] = (stamp, favorites)
+            pending = len(self._pending)
+        self._sync(seq)
+        self._ensure_worker()
+        if pending >= self.flush_threshold:
+            self._wakeup.set()
+        user.favorites = favorites
+        return user
+
+    def flush(self) -> int:
+        """
+        Writes all buffered favorites to the store in one transaction.
+
+        Returns:
+            int: Number of users written.
+        """
+        self._recover()
+        with self._flush_lock:
+            with self._sync_lock, self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+                journal, self._journal = self._journal, None
+                segments = self._segments(os.getpid())
+                if journal is not None:
+                    os.fsync(journal.fileno())
+                    journal.close()
+                    self._synced = self._written
+            try:
+                self.store.set_favorites_many(batch)
+            except BaseException:
+                with self._lock:
+                    # Keep newer updates made while the batch was in flight
+                    for user_id, entry in batch.items():
+                        self._pending.setdefault(user_id, entry)
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+            for path in segments:
+                os.remove(path)
+            return len(batch)
+
+    def close(self):
+        """
+        Flushes what is still buffered; registered to run at interpreter exit.
+        """
+        if self._pending:
+            self.flush()
+
+
+favorites_buffer = FavoritesBuffer(user_store, FAVORITES_JOURNAL)
+atexit.register(favorites_buffer.close)
@@ -0,0 +1,199 @@
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+from app.services.metrics import CACHE_EVENTS, registry, span
+from app.services.title_resolver import TitleResolver
+
+# pandas and scipy are imported with the model code on first use, so that
+# importing the app (and serving routes that need no model) stays fast
+if TYPE_CHECKING:
+    from app.model import RecommenderModel
+
+logger = logging.getLogger(__name__)
+
+# Seconds a client is asked to wait before retrying while the model loads
+RETRY_AFTER = 5
+
+
+class ModelNotReady(Exception):
+    """
+    Raised instead of blocking when the model is still being loaded in the
+    background, or failed to load.
+    """
+
+    def __init__(self, detail: str = "Recommendation model is loading"):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class ServedModel:
+    """
+    The recommendation model together with everything derived from it at load
+    time. Routes read it through `get_served_model()` once per request.
+    """
+
+    def __init__(self, model: "RecommenderModel", title_resolver: Optional[TitleResolver] = None):
+        self.model = model
+        self.title_resolver = title_resolver or TitleResolver(model.titles)
+
+
+_served: Optional[ServedModel] = None
+_loader: Optional[threading.Thread] = None
+_load_error: Optional[str] = None
+_load_lock = threading.Lock()
+
+
+@span("build_model")
+def build_model(engine: str = "table", neighbors: Optional[int] = None,
+                dims: Optional[int] = None) -> "RecommenderModel":
+    """
+    Runs the full pipeline from the MovieLens CSVs.
+    """
+    from app.embeddings import DEFAULT_DIMS
+    from app.model import train_model
+    from app.neighbors import DEFAULT_NEIGHBORS
+    from app.preprocessing import apply_rating_updates, load_data, preprocess_data, read_rating_updates
+
+    neighbors = DEFAULT_NEIGHBORS if neighbors is None else neighbors
+    dims = DEFAULT_DIMS if dims is None else dims
+    movies, ratings = load_data()
+    updates, updates_offset = read_rating_updates()
+    ratings = apply_rating_updates(ratings, updates)
+    movies_processed, ratings_processed = preprocess_data(movies, ratings)
+    model = train_model(movies_processed, ratings_processed, movies,
+                        engine=engine, neighbors=neighbors, dims=dims)
+    model.updates_offset = updates_offset
+    # Unique per build, since cached results are keyed by the model version
+    model.version = f"in-process-{os.urandom(4).hex()}"
+    return model
+
+
+def load_model() -> ServedModel:
+    """
+    Loads the current artifact build, falling back to an in-process build
+    when no artifacts have been written yet.
+    """
+    from app import artifacts
+
+    global _served
+    model = artifacts.load_model()
+    if model is None:
+        model = build_model()
+    _served = ServedModel(model)
+    return _served
+
+
+def _load_in_background(load: Callable[[], object]):
+    global _load_error
+    started = time.perf_counter()
+    try:
+        load()
+    except Exception as e:
+        _load_error = f"Recommendation model failed to load: {e}"
+        logger.exception("Loading the recommendation model failed")
+    else:
+        logger.info("Recommendation model ready in %.1fs", time.perf_counter() - started)
+
+
+def start_loading(load: Callable[[], object] = load_model) -> Optional[threading.Thread]:
+    """
+    Runs `load` (by default `load_model`) in a background thread. Until it
+    has installed a model, `get_served_model()` raises ModelNotReady instead
+    of blocking. Does nothing when a model is already loaded, e.g. by a
+    pre-forking master.
+    """
+    global _loader, _load_error
+    if _served is not None or (_loader is not None and _loader.is_alive()):
+        return _loader
+    _load_error = None
+    _loader = threading.Thread(target=_load_in_background, args=(load,),
+                               name="model-loader", daemon=True)
+    _loader.start()
+    return _loader
+
+
+def model_status() -> dict:
+    """
+    `ready` once the background load (if any) has finished with a model.
+    """
+    loading = _loader is not None and _loader.is_alive()
+    return {
+        "ready": _served is not None and not loading,
+        "loading": loading,
+        "error": _load_error,
+        "model_version": _served.model.version if _served is not None else None,
+    }
+
+
+def current_model() -> Optional[ServedModel]:
+    """
+    The served model if one is loaded, without loading or waiting for one.
+    """
+    return _served
+
+
+def get_served_model() -> ServedModel:
+    served = _served
+    if served is None:
+        # Never block a request on a load that runs in the background
+        if _loader is not None:
+            raise ModelNotReady(_load_error or ModelNotReady().detail)
+        with _load_lock:
+            return _served if _served is not None else load_model()
+    return served
+
+
+def swap_model(model: "RecommenderModel") -> ServedModel:
+    """
+    Atomically replaces the served model. Requests that already hold the old
+    ServedModel finish on it; new requests see the new one. The title index is
+    reused when the titles did not change.
+    """
+    global _served
+    current = _served
+    resolver = current.title_resolver if current is not None and current.model.titles is model.titles else None
+    _served = ServedModel(model, resolver)
+    return _served
+
+
+def _model_items() -> dict:
+    if _served is None:
+        return {}
+    model = _served.model
+    return {("titles",): model.matrix.shape[0], ("users",): model.matrix.shape[1],
+            ("ratings",): model.matrix.nnz, ("missing_records",): model.missing_records}
+
+
+def _model_bytes() -> dict:
+    if _served is None:
+        return {}
+    from app.neighbors import LSHIndex, NeighborTable
+
+    model = _served.model
+    matrix = model.matrix
+    index = model.neighbor_index
+    sizes = {("matrix",): matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes}
+    if isinstance(index, NeighborTable):
+        sizes[("neighbor_index",)] = index.indices.nbytes + index.scores.nbytes
+    elif isinstance(index, LSHIndex):
+        sizes[("neighbor_index",)] = index.keys.nbytes
+    return sizes
+
+
+def _resolver_cache() -> dict:
+    if _served is None:
+        return {}
+    info = _served.title_resolver.cache_info()
+    return {("title_resolver", "hit"): info.hits, ("title_resolver", "miss"): info.misses}
+
+
+# Read from the served model when scraped
+registry.gauge("cineverse_model_items", "Size of the served recommendation model.",
+               ("kind",), collect=_model_items)
+registry.gauge("cineverse_model_bytes", "Array bytes of the served recommendation model (memory-mapped or in RAM).",
+               ("part",), collect=_model_bytes)
+CACHE_EVENTS.add_collector(_resolver_cache)
+registry.gauge("cineverse_model_ready", "1 once the recommendation model is loaded and serving.",
+               collect=lambda: {(): float(model_status()["ready"])})
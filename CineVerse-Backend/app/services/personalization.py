@@ -0,0 +1,166 @@
+import hashlib
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from scipy.sparse import csr_matrix
+from app.models.movie import Movie
+from app.services.catalog import CatalogSnapshot, MovieCatalog, movie_catalog
+
+# Result sizes kept from the original rule-based recommender: up to
+# RESULT_LIMIT genre matches, topped up with top-rated titles to
+# FALLBACK_SIZE when fewer than MIN_MATCHES were found
+RESULT_LIMIT = 20
+MIN_MATCHES = 5
+FALLBACK_SIZE = 10
+
+# Scoring weights: genre affinity is in [0, 1], the rating term breaks ties
+# between equally matching titles, the diversity penalty discounts titles
+# whose genres are already covered by earlier picks
+RATING_WEIGHT = 0.1
+DIVERSITY_WEIGHT = 0.3
+POOL_FACTOR = 4
+SEED = 0
+
+
+class CatalogFeatures:
+    """
+    Array view of one catalog snapshot: a title x genre multi-hot matrix,
+    the rating vector and per-mood row masks.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.version = snapshot.version
+        self.movies: List[Movie] = list(snapshot.by_id.values())
+        self.rows: Dict[str, int] = {m.id: row for row, m in enumerate(self.movies)}
+
+        genres: Dict[str, int] = {}
+        indptr, indices = [0], []
+        for movie in self.movies:
+            cols = {genres.setdefault(g.casefold(), len(genres)) for g in movie.genres}
+            indices.extend(sorted(cols))
+            indptr.append(len(indices))
+        self.genres = csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(len(self.movies), len(genres)))
+        self.genre_counts = np.asarray(self.genres.sum(axis=1), dtype=np.float32).ravel()
+        self.ratings = np.nan_to_num(
+            np.array([m.rating for m in self.movies], dtype=np.float32))
+
+        self.moods: Dict[str, np.ndarray] = {}
+        for mood, movies in snapshot.by_mood.items():
+            mask = np.zeros(len(self.movies), dtype=bool)
+            mask[[self.rows[m.id] for m in movies if self.rows.get(m.id) is not None]] = True
+            self.moods[mood] = mask
+
+    def top_rated(self, n: int, exclude: np.ndarray) -> np.ndarray:
+        """
+        Rows of the n best-rated titles not in `exclude`, best first.
+        """
+        candidates = np.flatnonzero(~exclude)
+        return candidates[_top_n(self.ratings[candidates], n)]
+
+
+def _top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Positions of the n largest scores, best first (ties by position).
+    """
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, n - 1)[:n]
+    return part[np.lexsort((part, -scores[part]))]
+
+
+def _seed(user_id: str, version: str) -> int:
+    digest = hashlib.blake2b(f"{SEED}:{user_id}:{version}".encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+class PersonalRecommender:
+    """
+    Recommends titles from the genres of a user's favorites.
+
+    All candidates are scored with one sparse matrix-vector product against
+    the user's genre profile, the best are picked with argpartition and then
+    re-ranked greedily for genre diversity. Ties are broken by a jitter seeded
+    from the user id and the catalog version, so a user gets the same list
+    until the catalog changes. Features are rebuilt when the catalog version
+    changes; requests never touch the disk.
+    """
+
+    def __init__(self, catalog: MovieCatalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._features: Optional[CatalogFeatures] = None
+
+    def features(self) -> CatalogFeatures:
+        snapshot = self.catalog.snapshot()
+        features = self._features
+        if features is None or features.version != snapshot.version:
+            with self._lock:
+                features = self._features
+                if features is None or features.version != snapshot.version:
+                    features = self._features = CatalogFeatures(snapshot)
+        return features
+
+    def _diversify(self, features: CatalogFeatures, pool: np.ndarray,
+                   scores: np.ndarray, n: int) -> List[int]:
+        onehot = features.genres[pool].toarray()
+        sizes = np.maximum(features.genre_counts[pool], 1.0)
+        covered = np.zeros(onehot.shape[1], dtype=np.float32)
+        available = np.ones(len(pool), dtype=bool)
+        picked: List[int] = []
+        for step in range(min(n, len(pool))):
+            overlap = onehot @ covered / (sizes * max(step, 1))
+            adjusted = np.where(available, scores - DIVERSITY_WEIGHT * overlap, -np.inf)
+            best = int(np.argmax(adjusted))
+            picked.append(int(pool[best]))
+            available[best] = False
+            covered += onehot[best]
+        return picked
+
+    def recommend(self, user_id: str, favorites: Optional[List[str]],
+                  mood: Optional[str] = None, limit: int = RESULT_LIMIT) -> List[Movie]:
+        """
+        Args:
+            user_id (str): Seeds the tie-breaking.
+            favorites (Optional[List[str]]): Favorite movie ids, None for an unknown user.
+            mood (Optional[str]): Only recommend genre matches with this mood.
+            limit (int): Maximum number of genre-matched titles.
+
+        Returns:
+            List[Movie]: Recommended movies, best first.
+        """
+        features = self.features()
+        n_movies = len(features.movies)
+        if favorites is None:
+            top = features.top_rated(FALLBACK_SIZE, np.zeros(n_movies, dtype=bool))
+            return [features.movies[row] for row in top]
+
+        exclude = np.zeros(n_movies, dtype=bool)
+        fav_rows = [features.rows[f] for f in favorites if f in features.rows]
+        exclude[fav_rows] = True
+
+        picked: List[int] = []
+        if fav_rows and features.genres.shape[1]:
+            profile = np.asarray(features.genres[fav_rows].sum(axis=0)).ravel()
+            affinity = features.genres @ (profile / profile.sum()) if profile.any() \
+                else np.zeros(n_movies, dtype=np.float32)
+            eligible = (affinity > 0) & ~exclude
+            if mood:
+                eligible &= features.moods.get(mood.casefold(), np.zeros(n_movies, dtype=bool))
+
+            rng = np.random.default_rng(_seed(user_id, features.version))
+            scores = affinity + RATING_WEIGHT * features.ratings / 10.0 \
+                + rng.random(n_movies) * 1e-6
+            candidates = np.flatnonzero(eligible)
+            pool = candidates[_top_n(scores[candidates], limit * POOL_FACTOR)]
+            picked = self._diversify(features, pool, scores[pool], limit)
+
+        if len(picked) < MIN_MATCHES:
+            exclude[picked] = True
+            picked.extend(features.top_rated(FALLBACK_SIZE - len(picked), exclude).tolist())
+        return [features.movies[row] for row in picked]
+
+
+personal_recommender = PersonalRecommender(movie_catalog)
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from app.config import RATING_UPDATES_CSV
+from app.services import model_service
+
+logger = logging.getLogger(__name__)
+
+# Pending ratings are merged into the served model every MERGE_INTERVAL
+# seconds, or as soon as MERGE_THRESHOLD of them have been buffered
+MERGE_INTERVAL = float(os.getenv("CINEVERSE_RATING_MERGE_INTERVAL", "60"))
+MERGE_THRESHOLD = int(os.getenv("CINEVERSE_RATING_MERGE_THRESHOLD", "50000"))
+
+
+class RatingIngestor:
+    """
+    Buffers incoming (user, movie, rating) events and folds them into the
+    served model in the background.
+
+    Accepted events are appended to a journal first, so they survive restarts
+    and are picked up by the next offline build. A merge builds a complete new
+    model next to the current one and swaps it in with a single assignment,
+    so in-flight requests never see a half-updated model.
+    """
+
+    def __init__(self, journal_path: str, merge_interval: float = MERGE_INTERVAL,
+                 merge_threshold: int = MERGE_THRESHOLD):
+        self.journal_path = journal_path
+        self.merge_interval = merge_interval
+        self.merge_threshold = merge_threshold
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: Dict[Tuple[int, int], float] = {}
+        # End of the journal prefix whose events are all in the served model
+        # or pending here; it stops advancing once another process appends
+        self._journal_end = 0
+        self._merges = 0
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="rating-merge", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.merge_interval)
+            self._wakeup.clear()
+            try:
+                self.merge()
+            except Exception:
+                logger.exception("Merging rating updates failed")
+
+    def submit(self, events: List[Tuple[int, int, float]]) -> Tuple[int, int]:
+        """
+        Journals and buffers the events whose movie the model knows.
+
+        Returns:
+            Tuple[int, int]: Number of accepted and rejected events.
+        """
+        model = model_service.get_served_model().model
+        movie_ids = np.array([e[1] for e in events], dtype=np.int64)
+        known = model.rows_for_movies(movie_ids) >= 0
+        accepted = [e for e, ok in zip(events, known) if ok]
+
+        if accepted:
+            now = int(time.time())
+            lines = "".join(f"{u},{m},{r},{now}\n" for u, m, r in accepted)
+            with self._lock:
+                with open(self.journal_path, 'a') as f:
+                    start = f.tell()
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    if start == self._journal_end:
+                        self._journal_end = f.tell()
+                for user_id, movie_id, rating in accepted:
+                    self._pending[(user_id, movie_id)] = rating
+                pending = len(self._pending)
+            self._ensure_worker()
+            if pending >= self.merge_threshold:
+                self._wakeup.set()
+        return len(accepted), len(events) - len(accepted)
+
+    def merge(self) -> int:
+        """
+        Folds all buffered events into a new model and swaps it in.
+
+        Returns:
+            int: Number of events merged.
+        """
+        from app.model import fold_in
+
+        with self._merge_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                journal_end = self._journal_end
+            if not pending:
+                return 0
+            started = time.perf_counter()
+            model = model_service.get_served_model().model
+            user_ids = np.array([user_id for user_id, _ in pending], dtype=np.int64)
+            movie_ids = np.array([movie_id for _, movie_id in pending], dtype=np.int64)
+            ratings = np.array(list(pending.values()), dtype=np.float64)
+            try:
+                updated = fold_in(model, movie_ids, user_ids, ratings)
+            except Exception:
+                # Keep the events for the next merge; newer ones win
+                with self._lock:
+                    self._pending = {**pending, **self._pending}
+                raise
+            self._merges += 1
+            # Merges differ between processes; the pid keeps versions (and the
+            # result cache entries keyed by them) from colliding across workers
+            updated.version = f"{model.version.split('+')[0]}+{os.getpid()}.{self._merges}"
+            updated.updates_offset = max(model.updates_offset, journal_end)
+            model_service.swap_model(updated)
+            logger.info("Merged %d rating updates into %s in %.2fs",
+                        len(pending), updated.version, time.perf_counter() - started)
+            return len(pending)
+
+    def replay_journal(self) -> int:
+        """
+        Folds journaled events the loaded model does not contain yet (written
+        after its build) into it. Called once at startup.
+        """
+        from app.preprocessing import read_rating_updates
+
+        model = model_service.get_served_model().model
+        updates, end = read_rating_updates(model.updates_offset)
+        with self._lock:
+            for user_id, movie_id, rating in updates.itertuples(index=False):
+                self._pending[(int(user_id), int(movie_id))] = float(rating)
+            self._journal_end = end
+        if updates.empty:
+            model.updates_offset = end
+            return 0
+        return self.merge()
+
+
+rating_ingestor = RatingIngestor(RATING_UPDATES_CSV)
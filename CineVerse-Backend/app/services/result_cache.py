@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple
+from app.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# "memory" (default), "off", or a redis:// URL to share results between
+# processes and restarts (needs the optional redis package)
+BACKEND = os.getenv("CINEVERSE_RESULT_CACHE", "memory")
+TTL = float(os.getenv("CINEVERSE_RESULT_CACHE_TTL", "300"))
+MAX_ENTRIES = int(os.getenv("CINEVERSE_RESULT_CACHE_SIZE", "4096"))
+MAX_BYTES = int(float(os.getenv("CINEVERSE_RESULT_CACHE_MB", "64")) * 2**20)
+KEY_PREFIX = "cineverse:result:"
+
+
+class MemoryBackend:
+    """
+    In-process LRU bounded by entry count and total bytes, with a TTL per
+    entry. Entries larger than an eighth of the byte budget are not kept.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._bytes -= len(self._entries.pop(key)[1])
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if len(value) > self.max_bytes // 8:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= len(self._entries.popitem(last=False)[1][1])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Results in Redis (or any server speaking its protocol), shared by every
+    worker and kept across restarts; expiry is left to the server. Errors are
+    logged and treated as misses, so an unavailable server only costs the
+    cache, never a request.
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio  # noqa: F401
+        except ImportError:
+            raise RuntimeError(f"CINEVERSE_RESULT_CACHE={url} needs the redis package (pip install redis)")
+        self.url = url
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_client(self):
+        import redis.asyncio as redis
+
+        loop = asyncio.get_running_loop()
+        # Connections belong to one event loop
+        if self._client is None or self._loop is not loop:
+            # RESP2 only needs GET and SET, which any Redis-compatible server
+            # (KeyDB, Dragonfly, a local stand-in) answers
+            self._client = redis.from_url(self.url, protocol=2, socket_timeout=0.5,
+                                          socket_connect_timeout=0.5)
+            self._loop = loop
+        return self._client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self._ensure_client().get(key)
+        except Exception as e:
+            logger.warning("Result cache read failed: %s", e)
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        try:
+            await self._ensure_client().set(key, value, px=max(int(ttl * 1000), 1))
+        except Exception as e:
+            logger.warning("Result cache write failed: %s", e)
+
+
+class ResultCache:
+    """
+    Caches encoded endpoint responses by endpoint, version and arguments.
+
+    The version is the model build or catalog version the result was
+    computed from, so a retrained model or an edited catalog simply stops
+    matching the old entries; nothing is flushed. Concurrent misses for one
+    key share a single computation. Hits and misses are counted per endpoint
+    as `results_<endpoint>` in cineverse_cache_requests_total, requests that
+    joined a computation in flight as `results_<endpoint>_inflight` hits.
+    """
+
+    def __init__(self, backend, ttl: float = TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def key(endpoint: str, version: str, args: Sequence) -> str:
+        digest = hashlib.blake2b(json.dumps(list(args), separators=(",", ":")).encode(),
+                                 digest_size=12).hexdigest()
+        return f"{KEY_PREFIX}{endpoint}:{version}:{digest}"
+
+    async def _fill(self, key: str, compute: Callable[[], Awaitable[bytes]]) -> bytes:
+        value = await compute()
+        await self.backend.set(key, value, self.ttl)
+        return value
+
+    async def get_or_compute(self, endpoint: str, version: str, args: Sequence,
+                             compute: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        The cached result, or the result of `compute()` stored for the next
+        caller. Exceptions from `compute` reach every waiting caller and are
+        not cached.
+        """
+        if self.backend is None:
+            return await compute()
+        key = self.key(endpoint, version, args)
+        value = await self.backend.get(key)
+        if value is not None:
+            record_cache(f"results_{endpoint}", hits=1)
+            return value
+        record_cache(f"results_{endpoint}", misses=1)
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._inflight = {}
+            self._loop = loop
+        task = self._inflight.get(key)
+        record_cache(f"results_{endpoint}_inflight", hits=int(task is not None), misses=int(task is None))
+        if task is None:
+            task = asyncio.ensure_future(self._fill(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled request must not cancel the computation others wait on
+        return await asyncio.shield(task)
+
+
+def make_backend(spec: str = BACKEND):
+    if spec == "off":
+        return None
+    if spec == "memory":
+        return MemoryBackend()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(spec)
+    raise ValueError(f"Unknown CINEVERSE_RESULT_CACHE backend: {spec}")
+
+
+result_cache = ResultCache(make_backend())
@@ -0,0 +1,269 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from app.models.movie import Movie
+from app.services.catalog import CatalogSnapshot, MovieCatalog, movie_catalog
+
+TOKEN_RE = re.compile(r"\w+")
+
+# BM25 parameters and the extra weight given to a hit in the title
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 3.0
+
+# Bounds that keep a single query's cost independent of catalog size
+MAX_PREFIX_EXPANSIONS = 32
+MAX_INFIX_EXPANSIONS = 32
+MAX_POSTINGS_PER_TERM = 1000
+COMMON_TERM_RATIO = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.casefold())
+
+
+def trigrams(term: str) -> Set[str]:
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+class IndexState:
+    """
+    One version of the index. Once published it is only read (apart from the
+    memoized top postings), so queries score against it without locking;
+    `updated` builds the next version next to it, copying only the postings
+    it changes. Top postings carry over only for terms the update did not
+    touch, and only while the average document length stays the same.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.top_postings: Dict[str, List[Tuple[str, float]]] = {}
+        self.vocabulary: List[str] = []
+        # Trigram -> vocabulary terms containing it, for infix matches
+        self.grams: Dict[str, Set[str]] = {}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_source: Dict[str, Tuple[str, str]] = {}
+        self.doc_len: Dict[str, float] = {}
+        self.total_len = 0.0
+        # Postings and trigram sets already copied while building this version
+        self._owned: Optional[Set[str]] = None
+        self._owned_grams: Optional[Set[str]] = None
+
+    def _own(self, term: str) -> Dict[str, float]:
+        """
+        Postings of `term` that this version may modify, copied from the
+        previous version on first use.
+        """
+        postings = self.postings.get(term)
+        if postings is None:
+            postings = self.postings[term] = {}
+            bisect.insort(self.vocabulary, term)
+            for gram in trigrams(term):
+                self._own_gram(gram).add(term)
+        elif term not in self._owned:
+            postings = self.postings[term] = dict(postings)
+        self._owned.add(term)
+        self.top_postings.pop(term, None)
+        return postings
+
+    def _own_gram(self, gram: str) -> Set[str]:
+        terms = self.grams.get(gram)
+        if terms is None:
+            terms = self.grams[gram] = set()
+        elif gram not in self._owned_grams:
+            terms = self.grams[gram] = set(terms)
+        self._owned_grams.add(gram)
+        return terms
+
+    def _add(self, movie: Movie):
+        terms = Counter()
+        for token in tokenize(movie.title):
+            terms[token] += TITLE_WEIGHT
+        for token in tokenize(movie.description):
+            terms[token] += 1.0
+        for term, tf in terms.items():
+            self._own(term)[movie.id] = tf
+        length = sum(terms.values())
+        self.doc_terms[movie.id] = terms
+        self.doc_source[movie.id] = (movie.title, movie.description)
+        self.doc_len[movie.id] = length
+        self.total_len += length
+
+    def _remove(self, movie_id: str):
+        for term in self.doc_terms.pop(movie_id):
+            postings = self._own(term)
+            del postings[movie_id]
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+                for gram in trigrams(term):
+                    terms = self._own_gram(gram)
+                    terms.discard(term)
+                    if not terms:
+                        del self.grams[gram]
+        del self.doc_source[movie_id]
+        self.total_len -= self.doc_len.pop(movie_id)
+
+    def updated(self, snapshot: CatalogSnapshot) -> "IndexState":
+        """
+        The next version, indexing `snapshot`. Only movies that were added,
+        removed or edited are re-indexed; this version is left untouched.
+        """
+        state = IndexState()
+        state.postings = dict(self.postings)
+        state.top_postings = dict(self.top_postings)
+        state.vocabulary = list(self.vocabulary)
+        state.grams = dict(self.grams)
+        state.doc_terms = dict(self.doc_terms)
+        state.doc_source = dict(self.doc_source)
+        state.doc_len = dict(self.doc_len)
+        state.total_len = self.total_len
+        state._owned, state._owned_grams = set(), set()
+        for movie_id in [i for i in state.doc_source if i not in snapshot.by_id]:
+            state._remove(movie_id)
+        for movie_id, movie in snapshot.by_id.items():
+            source = state.doc_source.get(movie_id)
+            if source == (movie.title, movie.description):
+                continue
+            if source is not None:
+                state._remove(movie_id)
+            state._add(movie)
+        state._owned = state._owned_grams = None
+        # Memoized top postings were ranked with the previous average document
+        # length; keep them only if that is unchanged
+        if state.total_len != self.total_len or len(state.doc_len) != len(self.doc_len):
+            state.top_postings = {}
+        state.version = snapshot.version
+        return state
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _expand_infix(self, fragment: str) -> List[str]:
+        """
+        Terms that contain `fragment` (of at least three characters) past
+        their start, found by intersecting the terms of its trigrams.
+        """
+        groups = [self.grams.get(gram) for gram in trigrams(fragment)]
+        if not groups or None in groups:
+            return []
+        groups.sort(key=len)
+        candidates = set(groups[0]).intersection(*groups[1:])
+        terms = sorted(t for t in candidates if fragment in t and not t.startswith(fragment))
+        return terms[:MAX_INFIX_EXPANSIONS]
+
+    def _idf(self, term: str, n_docs: int) -> float:
+        df = len(self.postings[term])
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def _bm25(self, tf: float, doc_id: str, avg_len: float) -> float:
+        norm = K1 * (1 - B + B * self.doc_len[doc_id] / avg_len)
+        return tf * (K1 + 1) / (tf + norm)
+
+    def _driving_postings(self, term: str, avg_len: float):
+        """
+        Postings used to generate candidates. For terms matching more than
+        MAX_POSTINGS_PER_TERM movies only the highest-impact entries are walked,
+        which bounds the work per query no matter how large the catalog gets.
+        """
+        postings = self.postings[term]
+        if len(postings) <= MAX_POSTINGS_PER_TERM:
+            return postings.items()
+        top = self.top_postings.get(term)
+        if top is None:
+            top = heapq.nlargest(
+                MAX_POSTINGS_PER_TERM, postings.items(),
+                key=lambda item: self._bm25(item[1], item[0], avg_len))
+            self.top_postings[term] = top
+        return top
+
+    def score(self, query: str, infix: bool = False) -> Dict[str, float]:
+        """
+        BM25 scores of the movies matching `query`. With `infix` the last
+        token matches terms containing it rather than terms starting with it.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+        n_docs = len(self.doc_len)
+        avg_len = self.total_len / n_docs if n_docs else 0.0
+
+        # Exact terms for every complete word, prefix expansion for the last one
+        groups = [[t] if t in self.postings else [] for t in tokens[:-1]]
+        groups.append(self._expand_infix(tokens[-1]) if infix else self._expand_prefix(tokens[-1]))
+        terms = {t for group in groups for t in group}
+        if not terms:
+            return {}
+
+        # Very common terms only re-rank hits found through rarer terms
+        rare = {t for t in terms if len(self.postings[t]) <= COMMON_TERM_RATIO * n_docs}
+        driving = rare or terms
+
+        scores: Dict[str, float] = {}
+        for term in driving:
+            idf = self._idf(term, n_docs)
+            for doc_id, tf in self._driving_postings(term, avg_len):
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * self._bm25(tf, doc_id, avg_len)
+        for term in terms - driving:
+            postings = self.postings[term]
+            idf = self._idf(term, n_docs)
+            for doc_id in scores:
+                tf = postings.get(doc_id)
+                if tf:
+                    scores[doc_id] += idf * self._bm25(tf, doc_id, avg_len)
+        return scores
+
+
+class SearchIndex:
+    """
+    Inverted index over movie titles and descriptions with BM25 ranking.
+
+    The index follows the catalog: when the catalog version changes only the
+    movies that were added, removed or edited are re-indexed, into a new
+    IndexState that replaces the old one in a single assignment. The lock is
+    only held while doing that; queries score against the current state.
+    The last query token is matched as a prefix so partially typed words
+    already find results. When those hits do not fill the requested page,
+    movies with a word containing the last token (`man` in "Batman") follow
+    them, ranked the same way, as the plain substring search before the
+    index found them.
+    """
+
+    def __init__(self, catalog: MovieCatalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._state = IndexState()
+
+    def _sync(self, snapshot: CatalogSnapshot) -> IndexState:
+        state = self._state
+        if state.version == snapshot.version:
+            return state
+        with self._lock:
+            state = self._state
+            if state.version != snapshot.version:
+                state = self._state = state.updated(snapshot)
+            return state
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> List[Movie]:
+        snapshot = self.catalog.snapshot()
+        state = self._sync(snapshot)
+        scores = state.score(query)
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])
+        if len(top) < offset + limit:
+            extra = {k: v for k, v in state.score(query, infix=True).items() if k not in scores}
+            top += heapq.nlargest(offset + limit - len(top), extra.items(), key=lambda item: item[1])
+        return [snapshot.by_id[doc_id] for doc_id, _ in top[offset:]]
+
+
+movie_search_index = SearchIndex(movie_catalog)
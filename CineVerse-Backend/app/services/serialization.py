@@ -0,0 +1,106 @@
+import json
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+from fastapi import Response
+from app.models.movie import Movie
+from app.schemas.movie import MovieBase
+from app.services.catalog import MovieCatalog, movie_catalog
+from app.services.metrics import record_cache
+
+try:
+    import orjson
+except ImportError:  # optional, only faster
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    """
+    Compact JSON bytes, byte-for-byte what FastAPI's JSONResponse produces.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class MovieSerializer:
+    """
+    Encodes each catalog movie to its MovieBase JSON once per catalog version.
+
+    List responses are assembled by joining the cached fragments, so a
+    request does no model validation and no per-field encoding. Movies that
+    are not part of the current snapshot (e.g. held by a stale reader) are
+    encoded on the fly.
+    """
+
+    def __init__(self, catalog: MovieCatalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._fragments: Dict[int, Tuple[Movie, bytes]] = {}
+
+    @staticmethod
+    def encode(movie: Movie) -> bytes:
+        return dumps(MovieBase(**movie.as_dict()).model_dump(mode="json"))
+
+    def _current(self) -> Dict[int, Tuple[Movie, bytes]]:
+        version = self.catalog.version
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._fragments = {}
+                    self._version = version
+        return self._fragments
+
+    def _lookup(self, movie: Movie, fragments: Dict[int, Tuple[Movie, bytes]]) -> Optional[bytes]:
+        entry = fragments.get(id(movie))
+        if entry is not None and entry[0] is movie:
+            return entry[1]
+        return None
+
+    def _encode_into(self, movie: Movie, fragments: Dict[int, Tuple[Movie, bytes]]) -> bytes:
+        encoded = self.encode(movie)
+        fragments[id(movie)] = (movie, encoded)
+        return encoded
+
+    def fragment(self, movie: Movie) -> bytes:
+        fragments = self._current()
+        encoded = self._lookup(movie, fragments)
+        record_cache("movie_fragments", hits=encoded is not None, misses=encoded is None)
+        return encoded if encoded is not None else self._encode_into(movie, fragments)
+
+    def array(self, movies: Iterable[Movie]) -> bytes:
+        fragments = self._current()
+        parts, misses = [], 0
+        for movie in movies:
+            encoded = self._lookup(movie, fragments)
+            if encoded is None:
+                encoded = self._encode_into(movie, fragments)
+                misses += 1
+            parts.append(encoded)
+        # Counted once per response, not per movie
+        record_cache("movie_fragments", hits=len(parts) - misses, misses=misses)
+        return b"[" + b",".join(parts) + b"]"
+
+    def list_body(self, movies: Iterable[Movie], extra: Optional[dict] = None) -> bytes:
+        """
+        `{"success":true,"data":[...]}` followed by the `extra` fields, in order.
+        """
+        body = b'{"success":true,"data":' + self.array(movies)
+        for key, value in (extra or {}).items():
+            body += b"," + dumps(key) + b":" + dumps(value)
+        return body + b"}"
+
+    def list_response(self, movies: Iterable[Movie], extra: Optional[dict] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        return json_response(self.list_body(movies, extra), headers)
+
+    def detail_response(self, movie: Movie) -> Response:
+        return json_response(b'{"success":true,"data":' + self.fragment(movie) + b"}")
+
+
+movie_serializer = MovieSerializer(movie_catalog)
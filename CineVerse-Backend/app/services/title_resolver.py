@@ -0,0 +1,82 @@
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+from rapidfuzz import fuzz, process
+
+YEAR_SUFFIX_RE = re.compile(r"\s*[\(\[]?\b(?:18|19|20)\d{2}[\)\]]?\s*$")
+NON_WORD_RE = re.compile(r"[\W_]+")
+LEADING_ARTICLE_RE = re.compile(r"^(?:the|a|an)\s+")
+
+# How many trigram-blocked candidates get an exact rapidfuzz score
+SHORTLIST_SIZE = 64
+
+
+class TitleMatch(NamedTuple):
+    title: str
+    score: float
+    row: int
+
+
+def normalize_title(title: str) -> str:
+    """
+    Canonical form used for matching: accents stripped, case-folded,
+    punctuation collapsed to spaces, trailing release year and a leading
+    article removed. "The Matrix (1999)" and "matrix" normalize alike.
+    """
+    text = unicodedata.normalize("NFKD", str(title))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = YEAR_SUFFIX_RE.sub("", text)
+    text = NON_WORD_RE.sub(" ", text).strip()
+    return LEADING_ARTICLE_RE.sub("", text)
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class TitleResolver:
+    """
+    Resolves free-text movie names to rows of the recommendation model.
+
+    Titles are normalized and trigram-indexed once. A query only scores the
+    titles that share the most trigrams with it, and recent resolutions are
+    kept in a bounded LRU.
+    """
+
+    def __init__(self, titles: Sequence[str], cache_size: int = 4096):
+        self.titles = [str(t) for t in titles]
+        self._normalized = [normalize_title(t) for t in self.titles]
+        self._grams: Dict[str, List[int]] = {}
+        for row, norm in enumerate(self._normalized):
+            for gram in set(trigrams(norm)):
+                self._grams.setdefault(gram, []).append(row)
+        self._resolve_cached = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _shortlist(self, query: str) -> List[int]:
+        hits = Counter()
+        # Ordered de-duplication keeps tie-breaking stable across processes
+        for gram in dict.fromkeys(trigrams(query)):
+            hits.update(self._grams.get(gram, ()))
+        if not hits:
+            return list(range(len(self.titles)))
+        return [row for row, _ in hits.most_common(SHORTLIST_SIZE)]
+
+    def _resolve(self, query: str, limit: int) -> Tuple[TitleMatch, ...]:
+        choices = {row: self._normalized[row] for row in self._shortlist(query)}
+        matches = process.extract(
+            query, choices, scorer=fuzz.ratio, limit=limit)
+        return tuple(TitleMatch(self.titles[row], score, row)
+                     for _, score, row in matches)
+
+    def resolve(self, name: str, limit: int = 5) -> List[TitleMatch]:
+        """
+        Returns up to `limit` candidate titles for `name`, best first, with
+        their fuzz.ratio scores (0-100) against the normalized title.
+        """
+        return list(self._resolve_cached(normalize_title(name), limit))
+
+    def cache_info(self):
+        return self._resolve_cached.cache_info()
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.models.user import User
+from app.config import USERS_DB, USERS_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id        TEXT PRIMARY KEY,
+    email     TEXT NOT NULL UNIQUE,
+    name      TEXT NOT NULL,
+    password  TEXT NOT NULL,
+    favorites TEXT NOT NULL DEFAULT '[]',
+    -- time.time_ns() of the write the stored favorites came from
+    favorites_stamp INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+USER_COLUMNS = "id, name, email, password, favorites"
+
+
+def _row_to_user(row: sqlite3.Row) -> User:
+    return User(
+        id=row[0],
+        name=row[1],
+        email=row[2],
+        password=row[3],
+        favorites=json.loads(row[4]),
+    )
+
+
+class UserStore:
+    """
+    SQLite-backed user storage.
+
+    The database runs in WAL mode so readers never block the single writer, id
+    and email are unique-indexed, and every mutation touches exactly one row
+    inside its own transaction. Each thread gets its own connection.
+    """
+
+    def __init__(self, db_path: str, legacy_json_path: Optional[str] = None):
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(
+            self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(SCHEMA)
+                    self._add_favorites_stamp(conn)
+                    self._migrate_legacy_json(conn)
+                    self._initialized = True
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _add_favorites_stamp(conn: sqlite3.Connection):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        if "favorites_stamp" not in columns:
+            try:
+                conn.execute("ALTER TABLE users ADD COLUMN favorites_stamp INTEGER NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # added by another process in the meantime
+
+    def _migrate_legacy_json(self, conn: sqlite3.Connection):
+        """
+        One-shot import of the old users.json file. A marker row in `meta`
+        makes sure it never runs twice, even if the JSON file is left behind.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT 1 FROM meta WHERE key = 'users_json_migrated'").fetchone()
+            if not done and self.legacy_json_path and os.path.exists(self.legacy_json_path):
+                try:
+                    with open(self.legacy_json_path, 'r') as f:
+                        users_data = json.load(f)
+                except json.JSONDecodeError:
+                    users_data = []
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO users ({USER_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                    [(str(u["id"]), u["name"], u["email"], u["password"],
+                      json.dumps(u.get("favorites") or []))
+                     for u in users_data],
+                )
+            if not done:
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('users_json_migrated', '1')")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def all(self) -> List[User]:
+        rows = self._conn.execute(
+            f"SELECT {USER_COLUMNS} FROM users ORDER BY rowid").fetchall()
+        return [_row_to_user(row) for row in rows]
+
+    def get_by_id(self, user_id: str) -> Optional[User]:
+        row = self._conn.execute(
+            f"SELECT {USER_COLUMNS} FROM users WHERE id = ?", (user_id,)).fetchone()
+        return _row_to_user(row) if row else None
+
+    def get_by_email(self, email: str) -> Optional[User]:
+        row = self._conn.execute(
+            f"SELECT {USER_COLUMNS} FROM users WHERE email = ?", (email,)).fetchone()
+        return _row_to_user(row) if row else None
+
+    def create(self, name: str, email: str, password: str) -> User:
+        new_user = User(
+            id=str(uuid.uuid4()),
+            name=name,
+            email=email,
+            password=password,
+            favorites=[]
+        )
+        try:
+            with self._write() as conn:
+                conn.execute(
+                    f"INSERT INTO users ({USER_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                    (new_user.id, new_user.name, new_user.email, new_user.password, "[]"),
+                )
+        except sqlite3.IntegrityError:
+            # The unique index on email settles concurrent signups for the same address
+            raise ValueError("Email already registered")
+        return new_user
+
+    def update_favorites(self, user_id: str, favorites: List[str]) -> Optional[User]:
+        with self._write() as conn:
+            rows = conn.execute(
+                f"UPDATE users SET favorites = ?, favorites_stamp = MAX(favorites_stamp + 1, ?) "
+                f"WHERE id = ? RETURNING {USER_COLUMNS}",
+                (json.dumps(favorites), time.time_ns(), user_id),
+            ).fetchall()
+        return _row_to_user(rows[0]) if rows else None
+
+    def set_favorites_many(self, favorites: Dict[str, Tuple[int, List[str]]]) -> int:
+        """
+        Writes many users' favorites, given as user id -> (stamp, favorites),
+        in one transaction, synced to disk before returning. A user whose
+        stored favorites carry a stamp at least as new is left alone, so
+        writers that flush out of order cannot bring back older favorites.
+        Unknown user ids are skipped.
+
+        Returns:
+            int: Number of users updated.
+        """
+        if not favorites:
+            return 0
+        conn = self._conn
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            with self._write() as conn:
+                cursor = conn.executemany(
+                    "UPDATE users SET favorites = ?, favorites_stamp = ? WHERE id = ? AND favorites_stamp < ?",
+                    [(json.dumps(f), stamp, user_id, stamp) for user_id, (stamp, f) in favorites.items()],
+                )
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return cursor.rowcount
+
+
+user_store = UserStore(USERS_DB, legacy_json_path=USERS_FILE)
@@ -0,0 +1,119 @@
+"""
+Throughput per item of the batch endpoints against the single-item ones:
+hydrating movie ids (GET /movies/{id} vs POST /movies/batch) and similar
+titles for seed titles (GET /movies/ai/recommendations/{title} vs POST
+/movies/ai/recommendations/batch).
+
+Runs in process on synthetic data, or against a running server with --url.
+In process the result cache is turned off so every request is computed;
+against a server, start it with CINEVERSE_RESULT_CACHE=off for the same.
+
+    python -m benchmarks.batch --scale small
+    python -m benchmarks.batch --url http://127.0.0.1:5000 --sizes 10 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+from benchmarks import synthetic_data
+
+
+async def _rate(run: Callable[[], Awaitable[None]], items: int, seconds: float) -> dict:
+    """
+    Repeats `run` (which handles `items` items) for about `seconds`.
+    """
+    await run()  # warm-up
+    calls, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        await run()
+        calls += 1
+    elapsed = time.perf_counter() - started
+    return {"items_per_s": calls * items / elapsed, "ms_per_item": elapsed * 1000 / (calls * items)}
+
+
+async def run(client, sizes: List[int], seconds: float, seed: int = 0) -> Dict[str, dict]:
+    rng = random.Random(seed)
+    movies = (await client.get("/api/movies", params={"fields": "id,title"})).json()["data"]
+    ids = [m["id"] for m in movies]
+    titles = [m["title"] for m in movies]
+
+    async def check(response):
+        if response.status_code >= 500:
+            raise RuntimeError(f"{response.request.url} returned {response.status_code}")
+
+    results: Dict[str, dict] = {}
+    print(f"  {'case':<32} {'items/s':>10} {'ms/item':>9}")
+    for size in sizes:
+        batch_ids = rng.sample(ids, min(size, len(ids)))
+        seeds = rng.sample(titles, min(size, len(titles)))
+
+        async def ids_single():
+            for movie_id in batch_ids:
+                await check(await client.get(f"/api/movies/{movie_id}"))
+
+        async def ids_concurrent():
+            for r in await asyncio.gather(*[client.get(f"/api/movies/{i}") for i in batch_ids]):
+                await check(r)
+
+        async def ids_batch():
+            await check(await client.post("/api/movies/batch", json={"ids": batch_ids}))
+
+        async def seeds_single():
+            for title in seeds:
+                await check(await client.get(f"/api/movies/ai/recommendations/{title}"))
+
+        async def seeds_concurrent():
+            for r in await asyncio.gather(*[client.get(f"/api/movies/ai/recommendations/{t}") for t in seeds]):
+                await check(r)
+
+        async def seeds_batch():
+            await check(await client.post("/api/movies/ai/recommendations/batch", json={"titles": seeds}))
+
+        cases = [("movies", ids_single, "single"), ("movies", ids_concurrent, "concurrent"),
+                 ("movies", ids_batch, "batch"), ("similar", seeds_single, "single"),
+                 ("similar", seeds_concurrent, "concurrent"), ("similar", seeds_batch, "batch")]
+        for kind, fn, mode in cases:
+            name = f"{kind}_{size}_{mode}"
+            results[name] = await _rate(fn, size, seconds)
+            r = results[name]
+            print(f"  {name:<32} {r['items_per_s']:10.0f} {r['ms_per_item']:9.3f}")
+        for kind in ("movies", "similar"):
+            speedup = results[f"{kind}_{size}_batch"]["items_per_s"] / results[f"{kind}_{size}_single"]["items_per_s"]
+            print(f"  {kind}_{size}: batch is {speedup:.1f}x the single-item throughput")
+    return results
+
+
+async def main_async(args):
+    import httpx
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            return await run(client, args.sizes, args.seconds)
+
+    data_dir = args.data or os.path.join(tempfile.gettempdir(), f"cineverse-bench-{args.scale}")
+    synthetic_data.ensure(data_dir, args.scale)
+    # The app reads these at import time
+    os.environ["CINEVERSE_DATA_DIR"] = data_dir
+    os.environ["CINEVERSE_RESULT_CACHE"] = "off"
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        return await run(client, args.sizes, args.seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Target a running server instead of the app in process")
+    parser.add_argument("--scale", choices=synthetic_data.SCALES, default="small")
+    parser.add_argument("--data", help="Data directory (default: cached synthetic data at --scale)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50], help="Items per batch")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each case")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
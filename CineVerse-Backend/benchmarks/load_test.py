@@ -0,0 +1,142 @@
+"""
+Throughput of the API under concurrent mixed traffic.
+
+Starts the API with uvicorn (or targets --url) and replays a mix of catalog
+lookups, searches, personalized and item-to-item recommendations and
+favorite updates at increasing concurrency.
+
+    python -m benchmarks.load_test [--url http://127.0.0.1:5000] [--seconds 10] [--concurrency 1 4 16 64]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import List, Tuple
+import httpx
+
+# (weight, kind) of the request mix
+MIX = [
+    (30, "detail"),
+    (15, "genre"),
+    (15, "search"),
+    (15, "recommended"),
+    (20, "similar"),
+    (5, "favorites"),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health/ready", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def setup(client: httpx.AsyncClient) -> dict:
+    movies = (await client.get("/api/movies", params={"fields": "id,title,genres", "limit": 500})).json()["data"]
+    email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+    user = (await client.post("/api/auth/signup", json={"name": "load", "email": email, "password": "x"})).json()["data"]
+    return {
+        "ids": [m["id"] for m in movies],
+        "titles": [m["title"] for m in movies],
+        "genres": sorted({g for m in movies for g in m["genres"]}) or ["drama"],
+        "words": sorted({w for m in movies for w in m["title"].split() if len(w) > 3}) or ["the"],
+        "user": user["id"],
+    }
+
+
+def request_for(kind: str, ctx: dict, rng: random.Random) -> Tuple[str, str, dict]:
+    if kind == "detail":
+        return "GET", f"/api/movies/{rng.choice(ctx['ids'])}", {}
+    if kind == "genre":
+        return "GET", f"/api/movies/genre/{rng.choice(ctx['genres'])}", {}
+    if kind == "search":
+        return "GET", f"/api/movies/search/{rng.choice(ctx['words'])[:5]}", {}
+    if kind == "recommended":
+        return "GET", f"/api/movies/recommended/{ctx['user']}", {}
+    if kind == "similar":
+        return "GET", f"/api/movies/ai/recommendations/{rng.choice(ctx['titles'])}", {}
+    favorites = rng.sample(ctx["ids"], min(5, len(ctx["ids"])))
+    return "POST", f"/api/auth/users/{ctx['user']}/favorites", {"json": {"favorites": favorites}}
+
+
+async def run_level(client: httpx.AsyncClient, ctx: dict, concurrency: int, seconds: float) -> dict:
+    kinds = [k for w, k in MIX for _ in range(w)]
+    latencies: List[float] = []
+    errors = 0
+    stop = time.monotonic() + seconds
+
+    async def worker(seed: int):
+        nonlocal errors
+        rng = random.Random(seed)
+        while time.monotonic() < stop:
+            method, path, kwargs = request_for(rng.choice(kinds), ctx, rng)
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {"concurrency": concurrency, "requests": len(latencies), "rps": len(latencies) / elapsed,
+            "p50_ms": pick(0.5), "p99_ms": pick(0.99), "errors": errors}
+
+
+async def main_async(args):
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(args.workers)
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            ctx = await setup(client)
+            print(f"{'conc':>5} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'5xx':>5}")
+            for concurrency in args.concurrency:
+                r = await run_level(client, ctx, concurrency, args.seconds)
+                print(f"{r['concurrency']:>5} {r['requests']:>9} {r['rps']:>8.1f} "
+                      f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>5}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting a server")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
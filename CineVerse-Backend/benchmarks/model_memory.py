@@ -0,0 +1,103 @@
+"""
+Memory used by the in-memory catalog with the compact models vs the
+previous plain classes.
+
+    python -m benchmarks.model_memory [--movies 100000]
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from typing import List
+from app.models.movie import Movie
+from app.models.user import User
+
+GENRES = ["Action", "Adventure", "Animation", "Comedy", "Crime", "Drama", "Family",
+          "Fantasy", "Horror", "Mystery", "Romance", "Sci-Fi", "Thriller"]
+MOODS = ["Excited", "Inspired", "Happy", "Sad", "Relaxed", "Tense", "Romantic", "Thoughtful"]
+
+
+class LegacyMovie:
+    def __init__(self, id: str, title: str, description: str, releaseYear: int,
+                 duration: str, rating: float, genres: List[str], moods: List[str], poster_path: str):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.releaseYear = releaseYear
+        self.duration = duration
+        self.rating = rating
+        self.genres = genres if genres is not None else []
+        self.moods = moods if moods is not None else []
+        self.poster_path = poster_path
+
+
+class LegacyUser:
+    def __init__(self, id: str, name: str, email: str, password: str, favorites: List[str]):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.password = password
+        self.favorites = favorites if favorites is not None else []
+
+
+def movies_json(n: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    movies = [{
+        "id": str(i),
+        "title": f"Movie {i}",
+        "description": f"A film numbered {i}.",
+        "releaseYear": rng.randint(1950, 2024),
+        "duration": f"{rng.randint(80, 180)}m",
+        "rating": round(rng.uniform(1, 10), 1),
+        "genres": rng.sample(GENRES, rng.randint(1, 3)),
+        "moods": rng.sample(MOODS, rng.randint(0, 2)),
+        "poster_path": f"/posters/{i}.jpg",
+    } for i in range(n)]
+    return json.dumps(movies).encode()
+
+
+def users_json(n: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    users = [{
+        "id": f"user-{i}",
+        "name": f"User {i}",
+        "email": f"user{i}@example.com",
+        "password": "x" * 60,
+        "favorites": [str(rng.randrange(n)) for _ in range(rng.randint(0, 10))],
+    } for i in range(n)]
+    return json.dumps(users).encode()
+
+
+def retained(cls, raw: bytes) -> int:
+    """
+    Bytes still allocated after decoding `raw` and building `cls` objects
+    from it, like MovieCatalog does.
+    """
+    gc.collect()
+    tracemalloc.start()
+    objects = [cls(**item) for item in json.loads(raw)]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movies", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for label, raw, legacy, compact in [
+        (f"{args.movies} movies", movies_json(args.movies), LegacyMovie, Movie),
+        (f"{args.users} users", users_json(args.users), LegacyUser, User),
+    ]:
+        before, after = retained(legacy, raw), retained(compact, raw)
+        print(f"{label}: {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB "
+              f"({1 - after / before:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
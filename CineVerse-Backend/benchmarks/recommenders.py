@@ -0,0 +1,165 @@
+"""
+Offline evaluation of the neighbor engines: leave-one-out hit rate of user
+recommendations and latency of similar-title and user queries, for the
+precomputed cosine KNN table against truncated-SVD embeddings.
+
+For a sample of users one well-rated title (4 stars or more where the user
+has one) is removed from the rating matrix. Every engine is built on what
+remains and recommends `--k` titles to each sampled user; a hit is the
+held-out title among them. Recommending the most rated titles is reported
+as a baseline.
+
+    python -m benchmarks.recommenders --scale small
+    python -m benchmarks.recommenders --data ../data --dims 64 128 256 --out eval.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Tuple
+from scipy.sparse import csr_matrix
+import numpy as np
+from benchmarks import synthetic_data
+
+MIN_USER_RATINGS = 5
+
+
+def load_matrix(data_dir: str) -> Tuple[np.ndarray, np.ndarray, csr_matrix]:
+    # The app reads its data directory at import time
+    os.environ["CINEVERSE_DATA_DIR"] = data_dir
+    from app.model import build_rating_matrix
+    from app.preprocessing import load_data, preprocess_data
+
+    movies, ratings = load_data()
+    movies_processed, ratings_processed = preprocess_data(movies, ratings)
+    return build_rating_matrix(movies_processed, ratings_processed)
+
+
+def hold_out(matrix: csr_matrix, users: int, seed: int = 0) -> Tuple[csr_matrix, np.ndarray, np.ndarray]:
+    """
+    Removes one rating from each of up to `users` sampled users.
+
+    Returns:
+        Tuple[csr_matrix, np.ndarray, np.ndarray]: The training matrix, the sampled user columns and their held-out rows.
+    """
+    rng = np.random.default_rng(seed)
+    by_user = matrix.T.tocsr()
+    counts = np.diff(by_user.indptr)
+    eligible = np.flatnonzero(counts >= MIN_USER_RATINGS)
+    cols = np.sort(rng.choice(eligible, size=min(users, len(eligible)), replace=False))
+    rows = np.empty(len(cols), dtype=np.int64)
+    for i, col in enumerate(cols):
+        start, end = by_user.indptr[col], by_user.indptr[col + 1]
+        items, ratings = by_user.indices[start:end], by_user.data[start:end]
+        liked = items[ratings >= 4.0]
+        rows[i] = rng.choice(liked if len(liked) else items)
+    mask = csr_matrix((np.ones(len(cols)), (rows, cols)), shape=matrix.shape)
+    train = (matrix - matrix.multiply(mask)).tocsr()
+    train.eliminate_zeros()
+    return train, cols, rows
+
+
+def _ms_per_call(fn, args: List) -> float:
+    started = time.perf_counter()
+    for a in args:
+        fn(a)
+    return (time.perf_counter() - started) * 1000 / max(len(args), 1)
+
+
+def evaluate(model, cols: np.ndarray, held_out: np.ndarray, k: int, query_rows: np.ndarray) -> dict:
+    hits = 0
+    started = time.perf_counter()
+    for col, row in zip(cols.tolist(), held_out.tolist()):
+        hits += row in {r for r, _, _ in model.recommend_for_user(col, k)}
+    user_ms = (time.perf_counter() - started) * 1000 / len(cols)
+    return {
+        "hit_rate": hits / len(cols),
+        "user_ms": user_ms,
+        "similar_ms": _ms_per_call(lambda r: model.similar(int(r), k + 1), query_rows),
+    }
+
+
+def popularity_hit_rate(train: csr_matrix, cols: np.ndarray, held_out: np.ndarray, k: int) -> float:
+    popular = np.argsort(-np.diff(train.indptr), kind="stable")
+    by_user = train.T.tocsr()
+    hits = 0
+    for col, row in zip(cols.tolist(), held_out.tolist()):
+        rated = set(by_user.indices[by_user.indptr[col]:by_user.indptr[col + 1]].tolist())
+        hits += row in [r for r in popular[:k + len(rated)].tolist() if r not in rated][:k]
+    return hits / len(cols)
+
+
+def overlap(a, b, rows: np.ndarray, k: int) -> float:
+    return float(np.mean([len(set(a.similar(int(r), k + 1).tolist()) & set(b.similar(int(r), k + 1).tolist())) - 1
+                          for r in rows]) / k)
+
+
+def run(data_dir: str, users: int, dims: List[int], neighbors: int, k: int,
+        queries: int = 200, seed: int = 0) -> dict:
+    from app.model import RecommenderModel, build_neighbor_index
+
+    print(f"data: {data_dir}")
+    titles, user_ids, matrix = load_matrix(data_dir)
+    train, cols, held_out = hold_out(matrix, users, seed)
+    print(f"{train.shape[0]} titles x {train.shape[1]} users, {train.nnz} ratings; "
+          f"{len(cols)} users held out, top {k}")
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(train.shape[0], size=min(queries, train.shape[0]), replace=False)
+
+    engines: Dict[str, Tuple[str, dict]] = {f"knn_table_k{neighbors}": ("table", {"neighbors": neighbors})}
+    engines.update({f"svd_{d}": ("svd", {"dims": d}) for d in dims})
+    results: Dict[str, dict] = {}
+    models = {}
+    for name, (engine, options) in engines.items():
+        model = RecommenderModel(titles, user_ids, train, [None] * len(titles))
+        started = time.perf_counter()
+        model.neighbor_index = build_neighbor_index(train, model.norms, engine=engine, **options)
+        build_seconds = time.perf_counter() - started
+        results[name] = {"build_seconds": build_seconds, **evaluate(model, cols, held_out, k, query_rows)}
+        models[name] = model
+
+    brute = RecommenderModel(titles, user_ids, train, [None] * len(titles))
+    table = models[f"knn_table_k{neighbors}"]
+    for name, model in models.items():
+        if name != f"knn_table_k{neighbors}":
+            results[name]["similar_overlap_with_knn"] = overlap(model, table, query_rows, k)
+    results["brute_force_euclidean"] = {
+        "similar_ms": _ms_per_call(lambda r: brute.similar(int(r), k + 1), query_rows)}
+    results["most_rated"] = {"hit_rate": popularity_hit_rate(train, cols, held_out, k)}
+
+    print(f"  {'engine':<24} {'build s':>8} {'hit@' + str(k):>8} {'user ms':>8} {'similar ms':>11} {'overlap':>8}")
+    for name, r in results.items():
+        cells = [f"{r[key]:{fmt}}" if key in r else "" for key, fmt in
+                 (("build_seconds", "8.2f"), ("hit_rate", "8.3f"), ("user_ms", "8.3f"),
+                  ("similar_ms", "11.3f"), ("similar_overlap_with_knn", "8.3f"))]
+        print(f"  {name:<24} {cells[0]:>8} {cells[1]:>8} {cells[2]:>8} {cells[3]:>11} {cells[4]:>8}")
+    return {"data": data_dir, "users": len(cols), "k": k, "titles": int(train.shape[0]),
+            "ratings": int(train.nnz), "engines": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=synthetic_data.SCALES, default="small")
+    parser.add_argument("--data", help="Data directory (default: cached synthetic data at --scale)")
+    parser.add_argument("--users", type=int, default=1000, help="Users held out")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128])
+    parser.add_argument("--neighbors", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10, help="Recommendations per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write results JSON here")
+    args = parser.parse_args()
+
+    data_dir = args.data
+    if data_dir is None:
+        data_dir = os.path.join(tempfile.gettempdir(), f"cineverse-bench-{args.scale}")
+        synthetic_data.ensure(data_dir, args.scale)
+    results = run(data_dir, args.users, args.dims, args.neighbors, args.k, seed=args.seed)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Benchmark harness: pipeline stage timings and endpoint latency percentiles
+on synthetic data, stored as JSON and comparable between runs.
+
+    python -m benchmarks.run --scale small --out results.json
+    python -m benchmarks.run --scale small --out new.json --compare results.json
+    python -m benchmarks.run --compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from benchmarks import synthetic_data
+
+# A metric regresses when it gets worse by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+# Metrics below these floors are too small to compare reliably
+MIN_SECONDS = 0.005
+MIN_MS = 0.5
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+@contextmanager
+def measure(results: Dict[str, dict], stage: str, interval: float = 0.005):
+    """
+    Records wall time and the peak RSS sampled while the block runs.
+    """
+    peak = [_rss_bytes()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], _rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        done.set()
+        sampler.join()
+        peak[0] = max(peak[0], _rss_bytes())
+        results[stage] = {"seconds": seconds, "peak_rss_mb": peak[0] / 2**20}
+        print(f"  {stage:<24} {seconds:8.3f}s  peak RSS {peak[0] / 2**20:8.1f} MiB")
+
+
+def run_pipeline(data_dir: str) -> Dict[str, dict]:
+    from app import artifacts
+    from app.model import train_model
+    from app.preprocessing import load_movies, load_ratings, preprocess_data, preprocess_movies
+
+    for derived in ("cache", "artifacts"):
+        shutil.rmtree(os.path.join(data_dir, derived), ignore_errors=True)
+
+    results: Dict[str, dict] = {}
+    print("pipeline")
+    with measure(results, "load_movies"):
+        movies = load_movies()
+    retained = preprocess_movies(movies)["MOVIE_ID"].astype("int64")
+    with measure(results, "load_ratings_csv"):
+        ratings = load_ratings(retained)
+    with measure(results, "load_ratings_cached"):
+        ratings = load_ratings(retained)
+    with measure(results, "preprocess_data"):
+        movies_processed, ratings_processed = preprocess_data(movies, ratings)
+    with measure(results, "train_model"):
+        model = train_model(movies_processed, ratings_processed, movies)
+    with measure(results, "save_model"):
+        artifacts.save_model(model, artifacts.ARTIFACTS_DIR, sources={}, report={})
+    with measure(results, "load_model"):
+        artifacts.load_model(artifacts.ARTIFACTS_DIR)
+    return results
+
+
+def percentiles(samples: List[float]) -> dict:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {"n": len(samples), "mean_ms": sum(samples) / len(samples) * 1000,
+            "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99)}
+
+
+async def run_endpoints(requests: int, seed: int = 0) -> Dict[str, dict]:
+    import httpx
+    from app.main import app
+
+    rng = random.Random(seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        movies = (await client.get("/api/movies", params={"fields": "id,title,genres"})).json()["data"]
+        with open(os.path.join(os.environ["CINEVERSE_DATA_DIR"], "users.json")) as f:
+            users = json.load(f)
+        titles = [m["title"] for m in movies]
+        words = sorted({w for t in titles for w in t.split() if len(w) > 3})
+        genres = sorted({g for m in movies for g in m["genres"]})
+        endpoints: Dict[str, Callable[[], str]] = {
+            "list_page": lambda: "/api/movies?limit=50&sort=-rating",
+            "list_all": lambda: "/api/movies",
+            "detail": lambda: f"/api/movies/{rng.choice(movies)['id']}",
+            "search": lambda: f"/api/movies/search/{rng.choice(words)[:5]}",
+            "genre": lambda: f"/api/movies/genre/{rng.choice(genres)}",
+            "recommended": lambda: f"/api/movies/recommended/{rng.choice(users)['id']}",
+            "similar": lambda: f"/api/movies/ai/recommendations/{rng.choice(titles)}",
+        }
+        results: Dict[str, dict] = {}
+        print("endpoints")
+        for name, path in endpoints.items():
+            for _ in range(min(20, requests)):  # warm-up
+                await client.get(path())
+            samples = []
+            for _ in range(requests):
+                url = path()
+                started = time.perf_counter()
+                response = await client.get(url)
+                samples.append(time.perf_counter() - started)
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{url} returned {response.status_code}")
+            results[name] = percentiles(samples)
+            r = results[name]
+            print(f"  {name:<24} p50 {r['p50_ms']:7.2f} ms  p90 {r['p90_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms")
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Prints every shared metric side by side and returns the regressions.
+    Lower is better for all of them.
+    """
+    regressions = []
+    rows = []
+    for section, metrics in (("pipeline", ("seconds", "peak_rss_mb")),
+                             ("endpoints", ("p50_ms", "p99_ms"))):
+        for name, new_values in new.get(section, {}).items():
+            old_values = old.get(section, {}).get(name)
+            if not old_values:
+                continue
+            for metric in metrics:
+                before, after = old_values[metric], new_values[metric]
+                floor = MIN_SECONDS if metric == "seconds" else MIN_MS if metric.endswith("_ms") else 0
+                change = (after - before) / before if before else 0.0
+                flag = max(before, after) >= floor and change > threshold
+                label = f"{section}.{name}.{metric}"
+                rows.append(f"  {label:<40} {before:10.3f} -> {after:10.3f}  {change:+7.1%}"
+                            + ("  REGRESSION" if flag else ""))
+                if flag:
+                    regressions.append(label)
+    print(f"compare ({old.get('meta', {}).get('git')} -> {new.get('meta', {}).get('git')})")
+    print("\n".join(rows))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", help="With --compare and no run: OLD NEW result files")
+    parser.add_argument("--scale", choices=synthetic_data.SCALES, default="small")
+    parser.add_argument("--data", help="Synthetic data directory (default: a cached temp dir per scale)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a previous results file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--skip-pipeline", action="store_true")
+    args = parser.parse_args()
+
+    if args.compare and args.files:
+        with open(args.compare) as f_old, open(args.files[0]) as f_new:
+            regressions = compare(json.load(f_old), json.load(f_new), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    data_dir = args.data or os.path.join(tempfile.gettempdir(), f"cineverse-bench-{args.scale}")
+    print(f"data: {data_dir} ({args.scale})")
+    try:
+        # Also refuses real data directories, whose users.db is deleted below
+        synthetic_data.ensure(data_dir, args.scale)
+    except ValueError as e:
+        parser.error(str(e))
+    # The app reads its data directory at import time
+    os.environ["CINEVERSE_DATA_DIR"] = data_dir
+    for path in ("users.db", "users.db-wal", "users.db-shm"):
+        if os.path.exists(os.path.join(data_dir, path)):
+            os.remove(os.path.join(data_dir, path))
+
+    results = {
+        "meta": {
+            "scale": args.scale,
+            "params": synthetic_data.SCALES[args.scale],
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "pipeline": {} if args.skip_pipeline else run_pipeline(data_dir),
+        "endpoints": asyncio.run(run_endpoints(args.requests)),
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results: {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
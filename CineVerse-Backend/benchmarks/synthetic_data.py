@@ -0,0 +1,225 @@
+"""
+Synthetic MovieLens-style data for benchmarks.
+
+Writes movies_metadata.csv, ratings.csv, movies.json and users.json with the
+columns the app reads. Popularity follows a Zipf-like curve (a few titles
+get most of the ratings), user activity is log-normal and about 30% of the
+titles are not in English, so the pipeline's filters behave as on the real
+data. Users belong to taste groups that favour two genres, rating titles of
+those genres more often and higher, which gives recommenders something to
+learn.
+
+    python -m benchmarks.synthetic_data --out /tmp/cineverse-small --scale small
+"""
+import argparse
+import ast
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+SCALES = {
+    # movies, users, ratings, catalog entries (movies.json), app users (users.json)
+    "tiny": dict(movies=500, users=300, ratings=20_000, catalog=200, app_users=50),
+    "small": dict(movies=5_000, users=5_000, ratings=500_000, catalog=2_000, app_users=500),
+    "medium": dict(movies=20_000, users=50_000, ratings=5_000_000, catalog=20_000, app_users=5_000),
+    # About the size of the full MovieLens dump used by the README
+    "large": dict(movies=45_000, users=270_000, ratings=26_000_000, catalog=100_000, app_users=50_000),
+}
+
+GENRES = ["Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary", "Drama",
+          "Family", "Fantasy", "History", "Horror", "Music", "Mystery", "Romance",
+          "Science Fiction", "Thriller", "War", "Western"]
+MOODS = ["Excited", "Inspired", "Happy", "Sad", "Relaxed", "Tense", "Romantic",
+         "Thoughtful", "Scared", "Nostalgic"]
+LANGUAGES = ["en"] * 7 + ["fr", "es", "ja"]
+WORDS = ("night day last first dark light lost city river star king queen road house "
+         "love war game secret storm shadow dream ghost wild blue red silent black iron "
+         "golden broken hidden empire return rise fall journey heart stone fire water").split()
+RATINGS_CHUNK = 2_000_000
+# Taste groups of users and how strongly they favour their two genres
+TASTE_GROUPS = 24
+TASTE_BOOST = 4.0
+# Part of the data marker: bump when the same parameters produce different data
+GENERATOR_VERSION = 2
+
+
+def _titles(rng: np.random.Generator, n: int) -> np.ndarray:
+    words = np.array([w.capitalize() for w in WORDS])
+    lengths = rng.integers(1, 4, size=n)
+    picks = rng.integers(0, len(words), size=(n, 3))
+    titles = [" ".join(words[picks[i, :lengths[i]]]) for i in range(n)]
+    # Suffix most titles to keep them mostly distinct, like a real catalog
+    return np.array([t if i % 7 == 0 else f"{t} {i}" for i, t in enumerate(titles)])
+
+
+def _genres(rng: np.random.Generator, n: int) -> list:
+    counts = rng.integers(1, 4, size=n)
+    weights = np.linspace(2, 0.5, len(GENRES))
+    weights /= weights.sum()
+    return [list(rng.choice(len(GENRES), size=c, replace=False, p=weights)) for c in counts]
+
+
+def write_movies_metadata(path: str, rng: np.random.Generator, n: int) -> pd.DataFrame:
+    ids = np.arange(1, n + 1)
+    # Heavy-tailed vote counts; popularity rank follows vote count
+    vote_count = np.floor(rng.pareto(1.2, size=n) * 300).astype(np.int64)
+    genres = _genres(rng, n)
+    movies = pd.DataFrame({
+        "adult": False,
+        "genres": [str([{"id": int(g), "name": GENRES[g]} for g in gs]) for gs in genres],
+        "id": ids,
+        "original_language": rng.choice(LANGUAGES, size=n),
+        "original_title": _titles(rng, n),
+        "overview": [f"Synthetic overview for movie {i}." for i in ids],
+        "poster_path": [f"/synthetic/{i}.jpg" for i in ids],
+        "release_date": pd.to_datetime(rng.integers(-2_000, 19_500, size=n), unit="D").strftime("%Y-%m-%d"),
+        "runtime": rng.integers(70, 200, size=n).astype(float),
+        "vote_average": np.round(np.clip(rng.normal(6.2, 1.1, size=n), 0, 10), 1),
+        "vote_count": vote_count,
+    })
+    movies.to_csv(path, index=False)
+    return movies
+
+
+def write_ratings(path: str, rng: np.random.Generator, movie_ids: np.ndarray,
+                  popularity: np.ndarray, movie_genres: list, n_users: int, n_ratings: int):
+    favourites = np.array([rng.choice(len(GENRES), size=2, replace=False) for _ in range(TASTE_GROUPS)])
+    # matches[g, m]: movie m has one of group g's favourite genres
+    genre_hot = np.zeros((len(movie_ids), len(GENRES)), dtype=bool)
+    for m, genres in enumerate(movie_genres):
+        genre_hot[m, genres] = True
+    matches = genre_hot[:, favourites].any(axis=2).T
+    movie_p = popularity * (1 + TASTE_BOOST * matches)
+    movie_p /= movie_p.sum(axis=1, keepdims=True)
+    user_group = rng.integers(0, TASTE_GROUPS, size=n_users)
+    activity = rng.lognormal(0, 1.2, size=n_users)
+    user_p = activity / activity.sum()
+    with open(path, "w") as f:
+        f.write("userId,movieId,rating,timestamp\n")
+        for start in range(0, n_ratings, RATINGS_CHUNK):
+            size = min(RATINGS_CHUNK, n_ratings - start)
+            users = rng.choice(n_users, size=size, p=user_p)
+            groups = user_group[users]
+            movies = np.empty(size, dtype=np.int64)
+            for g in range(TASTE_GROUPS):
+                in_group = np.flatnonzero(groups == g)
+                movies[in_group] = rng.choice(len(movie_ids), size=len(in_group), p=movie_p[g])
+            liked = matches[groups, movies]
+            stars = rng.normal(np.where(liked, 4.0, 2.8), 0.9)
+            chunk = pd.DataFrame({
+                "userId": users + 1,
+                "movieId": movie_ids[movies],
+                "rating": np.clip(np.round(stars * 2) / 2, 0.5, 5.0),
+                "timestamp": rng.integers(800_000_000, 1_500_000_000, size=size),
+            })
+            chunk.to_csv(f, header=False, index=False)
+
+
+def write_catalog(path: str, rng: np.random.Generator, movies: pd.DataFrame, n: int):
+    rows = movies.sample(n=n, replace=n > len(movies), random_state=int(rng.integers(2**31)))
+    catalog = []
+    for i, row in enumerate(rows.itertuples(index=False)):
+        catalog.append({
+            "id": str(i + 1),
+            "title": row.original_title,
+            "description": f"A synthetic film titled '{row.original_title}'.",
+            "releaseYear": int(row.release_date[:4]),
+            "duration": f"{int(row.runtime)}m",
+            "rating": float(row.vote_average),
+            "genres": [g["name"] for g in ast.literal_eval(row.genres)],
+            "moods": list(rng.choice(MOODS, size=int(rng.integers(0, 3)), replace=False)),
+            "poster_path": row.poster_path,
+        })
+    with open(path, "w") as f:
+        json.dump(catalog, f)
+
+
+def write_users(path: str, rng: np.random.Generator, n: int, n_catalog: int):
+    users = [{
+        "id": str(i + 1),
+        "name": f"User {i + 1}",
+        "email": f"user{i + 1}@example.com",
+        "password": "password",
+        "favorites": [str(m) for m in rng.choice(n_catalog, size=int(rng.integers(0, 12)), replace=False) + 1],
+    } for i in range(n)]
+    with open(path, "w") as f:
+        json.dump(users, f)
+
+
+def check_output_dir(out_dir: str):
+    """
+    Refuses to write into a directory that is neither empty nor generated
+    here, since generating replaces its movies, users and derived caches.
+
+    Raises:
+        ValueError: If `out_dir` holds files but no synthetic.json marker.
+    """
+    if os.path.isdir(out_dir) and os.listdir(out_dir) \
+            and not os.path.exists(os.path.join(out_dir, "synthetic.json")):
+        raise ValueError(f"{out_dir} is not a synthetic data directory (no synthetic.json); "
+                         "use an empty or new directory")
+
+
+def generate(out_dir: str, movies: int, users: int, ratings: int, catalog: int,
+             app_users: int, seed: int = 0) -> dict:
+    """
+    Writes a full data directory and returns the parameters used.
+    """
+    check_output_dir(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    metadata = write_movies_metadata(os.path.join(out_dir, "movies_metadata.csv"), rng, movies)
+    popularity = metadata["vote_count"].to_numpy(dtype=np.float64) + 1.0
+    movie_genres = [[g["id"] for g in ast.literal_eval(gs)] for gs in metadata["genres"]]
+    write_ratings(os.path.join(out_dir, "ratings.csv"), rng, metadata["id"].to_numpy(),
+                  popularity, movie_genres, users, ratings)
+    write_catalog(os.path.join(out_dir, "movies.json"), rng, metadata, catalog)
+    write_users(os.path.join(out_dir, "users.json"), rng, app_users, catalog)
+    params = dict(movies=movies, users=users, ratings=ratings, catalog=catalog,
+                  app_users=app_users, seed=seed, generator=GENERATOR_VERSION)
+    with open(os.path.join(out_dir, "synthetic.json"), "w") as f:
+        json.dump(params, f)
+    return params
+
+
+def ensure(out_dir: str, scale: str, seed: int = 0) -> str:
+    """
+    Generates `scale` into `out_dir` unless the same data is already there.
+    """
+    params = dict(SCALES[scale], seed=seed, generator=GENERATOR_VERSION)
+    marker = os.path.join(out_dir, "synthetic.json")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == params:
+                return out_dir
+    check_output_dir(out_dir)
+    # Caches and model builds of the previous data would be served as is
+    for derived in ("cache", "artifacts"):
+        shutil.rmtree(os.path.join(out_dir, derived), ignore_errors=True)
+    generate(out_dir, **dict(SCALES[scale]), seed=seed)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", required=True, help="Data directory to write")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f"Override the scale's {name}")
+    args = parser.parse_args()
+    params = dict(SCALES[args.scale])
+    params.update({k: v for k, v in vars(args).items() if k in params and v is not None})
+    started = time.perf_counter()
+    try:
+        generate(args.out, seed=args.seed, **params)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Wrote {params} to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+from app.services.favorites_buffer import FavoritesBuffer
+from app.services.user_store import UserStore
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def test_two_buffers_recover_the_same_orphaned_segment(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"))
+    user = store.create("a", "a@example.com", "pw")
+    journal = str(tmp_path / "favorites.journal")
+    segment = f"{journal}.{_dead_pid()}.0000000001"
+    with open(segment, "w") as f:
+        f.write(json.dumps({"u": user.id, "f": ["1", "2"], "t": 5}) + "\n")
+
+    first = FavoritesBuffer(UserStore(str(tmp_path / "users.db")), journal)
+    second = FavoritesBuffer(UserStore(str(tmp_path / "users.db")), journal)
+    # Both see the segment as orphaned before either has claimed it
+    orphaned = first._orphaned()
+    assert orphaned == [segment]
+    second._recover()
+    first._orphaned = lambda: orphaned
+    first._recover()
+
+    assert first._recovered and second._recovered
+    assert store.get_by_id(user.id).favorites == ["1", "2"]
+    assert not [p for p in os.listdir(tmp_path) if p.startswith("favorites.journal")]
@@ -0,0 +1,25 @@
+from app.models.movie import Movie
+from app.services import search_index
+from app.services.catalog import CatalogSnapshot
+from app.services.search_index import IndexState
+
+
+def _movie(id: str, title: str, description: str) -> Movie:
+    return Movie(id, title, description, 2000, "90 min", 7.0, [], [], "")
+
+
+def test_updated_index_ranks_frequent_terms_like_a_fresh_one(monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_POSTINGS_PER_TERM", 1)
+    movies = [
+        # Which of these two ranks higher for "x" depends on the average length
+        _movie("1", "x", "w " * 40),
+        _movie("2", "", "x"),
+        _movie("3", "", "y " * 10),
+    ]
+    old = IndexState().updated(CatalogSnapshot(movies, "1"))
+    assert list(old.score("x")) == ["2"]
+
+    snapshot = CatalogSnapshot(movies + [_movie("4", "", "z " * 500)], "2")
+    new = old.updated(snapshot)
+    assert new.score("x") == IndexState().updated(snapshot).score("x")
+    assert list(new.score("x")) == ["1"]
@@ -17,10 +17,10 @@ export default function AISearchPage() {
     setError(null);
     setResults([]);
     try {
-      const res = await moviesApi.aiSearch(input);
-      if (res.success && res.data) {
-        setResults(res.data);
-      } else {
+      const res = await moviesApi.aiSearchStream(input, (movie) =>
+        setResults((prev) => [...prev, movie])
+      );
+      if (!res.success || !res.data?.length) {
         setError("No results found.");
       }
     } catch (err) {
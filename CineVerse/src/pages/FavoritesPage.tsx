@@ -6,7 +6,6 @@ import MovieCard from "@/components/MovieCard";
 import { Button } from "@/components/ui/button";
 import { useAuth } from "@/contexts/AuthContext";
 import { Film } from "lucide-react";
-import { Movie } from "@/data/movies";
 import { moviesApi } from "@/services/api";
 import { useQuery } from "@tanstack/react-query";
 
@@ -20,16 +19,8 @@ export default function FavoritesPage() {
         return [];
       }
 
-      const moviePromises = user.favorites.map((id) =>
-        moviesApi
-          .getById(id)
-          .then((result) =>
-            result.success && result.data ? result.data : null
-          )
-      );
-
-      const movies = await Promise.all(moviePromises);
-      return movies.filter((movie): movie is Movie => movie !== null);
+      const result = await moviesApi.getByIds(user.favorites);
+      return result.success && result.data ? result.data : [];
     },
     enabled: isAuthenticated && !!user && user.favorites.length > 0,
   });
@@ -105,6 +105,25 @@ export const moviesApi = {
     }
   },
   
+  // Get several movies by ID, in the order given (up to 500 per request)
+  getByIds: async (ids: string[]): Promise<ApiResponse<Movie[]>> => {
+    try {
+      const chunks: string[][] = [];
+      for (let i = 0; i < ids.length; i += 500) {
+        chunks.push(ids.slice(i, i + 500));
+      }
+      const results = await Promise.all(
+        chunks.map((chunk) => fetchApi<Movie[]>(`/movies/batch`, "POST", { ids: chunk }))
+      );
+      if (results.some((result) => !result.success)) {
+        return { success: false, error: 'Failed to load movies' };
+      }
+      return { success: true, data: results.flatMap((result) => result.data ?? []) };
+    } catch (error) {
+      return { success: false, error: 'Failed to load movies' };
+    }
+  },
+  
   // Search movies by name
   search: async (query: string): Promise<ApiResponse<Movie[]>> => {
     try {
@@ -164,6 +183,46 @@ export const moviesApi = {
     } catch (error) {
       return { success: false, error: 'Failed to load AI search results' };
     }
+  },
+
+  // AI Search streamed as NDJSON: onMovie is called for each movie as soon as it arrives
+  aiSearchStream: async (prompt: string, onMovie: (movie: Movie) => void): Promise<ApiResponse<Movie[]>> => {
+    const movies: Movie[] = [];
+    try {
+      const response = await fetch(`${API_BASE_URL}/movies/ai-search/stream`, {
+        method: "POST",
+        body: JSON.stringify({ prompt }),
+        headers: {
+          'Content-Type': 'application/json',
+        },
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      const handleLine = (line: string) => {
+        if (!line.trim()) return;
+        const item = JSON.parse(line);
+        if (item.error) throw new Error(item.error);
+        movies.push(item);
+        onMovie(item);
+      };
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        lines.forEach(handleLine);
+      }
+      handleLine(buffer);
+      return { success: true, data: movies };
+    } catch (error) {
+      console.error('API error (/movies/ai-search/stream):', error);
+      return { success: movies.length > 0, data: movies, error: 'Failed to load AI search results' };
+    }
   }
 };
 